@@ -1,41 +1,242 @@
 #!/usr/bin/env python
 """ This file runs every file in ./scripts
+
+Scripts whose inputs haven't changed since the last build are skipped (see scripts/reusable_code/manifest.py).
+Pass --force to rebuild everything anyway.
+
+Scripts are run by a bounded pool of workers, longest first (see scripts/reusable_code/scheduler.py).
+Each script is forked from a pre-warmed render server (see scripts/reusable_code/render_server.py),
+pass --no-server to start a fresh python3 for every script instead.
+
+Each script records how long its phases take (see scripts/reusable_code/timing.py). They are written to a
+Chrome trace in .build/traces/, and compared with the previous build in a table at the end.
+
+The .npz files the scripts load are decoded once into shared memory, and the scripts map them read-only
+(see scripts/reusable_code/shared_data.py).
+
+LaTeX text sizes are cached across builds (see scripts/reusable_code/text_metrics.py). Pass --latex-daemon to
+also measure new text with a single shared LaTeX process, instead of one per script.
+
+Pass --formats pgf,pdf,png to also save a PDF and a PNG of every plot to ./previews, for reviewing the plots
+without LaTeX (see scripts/reusable_code/export.py).
+
+Plots are only rewritten when their content changes, and the ones that changed since the last build are bundled
+into .build/upload/ for overleaf (see scripts/reusable_code/bundle.py).
+
+Raw trajectory logs of datasets with a logs_dir are converted into .npz files first, in bounded memory
+(see scripts/reusable_code/ingest.py).
+
+Pass --watch to keep running, and re-render plots whenever a file they depend on changes
+(see scripts/reusable_code/watch.py).
 """
+import argparse
 import os
 import subprocess
+import sys
+import time
+from typing import List, Set
 
-print("Running all python scripts in ./scripts")
+from scripts.reusable_code.bundle import Bundler
+from scripts.reusable_code.datasets import DATASETS
+from scripts.reusable_code.export import BACKENDS, FORMATS_ENV, PLOTS_DIR
+from scripts.reusable_code.ingest import ingest_dataset
+from scripts.reusable_code.manifest import Manifest, plot_name, script_module
+from scripts.reusable_code.render_server import ForkServerRunner, benchmark
+from scripts.reusable_code.scheduler import History, Job, Scheduler, SubprocessRunner, available_memory
+from scripts.reusable_code.shared_data import SHARED_DATA_ENV, SharedTrajectories
+from scripts.reusable_code.text_metrics import DAEMON_ENV
+from scripts.reusable_code.timing import TRACE_DIR_ENV, TRACES_DIR, BuildTrace
+from scripts.reusable_code.watch import POLL_INTERVAL, WATCH_DIRS, Watcher
+
+parser = argparse.ArgumentParser(description="Generate every .pgf plot in ./plots")
+parser.add_argument("--force", action="store_true", help="rebuild every plot, even if it is up to date")
+parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                    help="how many scripts to run at once (default: number of cores)")
+parser.add_argument("--memory-budget", type=int, default=None,
+                    help="MiB of RAM the scripts may use at once (default: currently available memory)")
+parser.add_argument("--no-server", action="store_true",
+                    help="run every script in a new python3, instead of forking it from the render server")
+parser.add_argument("--benchmark", metavar="MODULE",
+                    help="time one script (e.g. scripts.dataset1.histogram) cold vs. from the render server, then exit")
+parser.add_argument("--latex-daemon", action="store_true",
+                    help="measure text with one shared LaTeX process, instead of one per script")
+parser.add_argument("--formats", default="pgf",
+                    help=f"comma separated formats to save every plot in, out of {','.join(BACKENDS)} (default: pgf). "
+                         "Everything but the .pgf goes to ./previews")
+parser.add_argument("--watch", action="store_true",
+                    help="keep running, and re-render the plots affected by every file you save")
+args = parser.parse_args()
+
+if args.benchmark:
+    print(f"Benchmarking {args.benchmark}")
+    benchmark(args.benchmark)
+    sys.exit(0)
+
+formats = sorted({f.strip() for f in args.formats.split(",") if f.strip()} | {"pgf"})
+unknown = [f for f in formats if f not in BACKENDS]
+if unknown:
+    parser.error(f"unknown format {', '.join(unknown)}, expected some of {','.join(BACKENDS)}")
+# Passed on to every script, like the environment variables below
+os.environ[FORMATS_ENV] = ",".join(formats)
 
 exclude = {"reusable_code"}
 
-py_files = []
-for root, dirs, files in os.walk("scripts"):
-    # Filter out dirs we dont want
-    dirs[:] = [d for d in dirs if d not in exclude]
 
-    for file in files:
-        if file.endswith(".py") and not file.startswith('__'):
-            py_files.append(os.path.join(root, file))
+def find_scripts() -> List[str]:
+    py_files = []
+    for root, dirs, files in os.walk("scripts"):
+        # Filter out dirs we dont want
+        dirs[:] = [d for d in dirs if d not in exclude]
+
+        for file in files:
+            if file.endswith(".py") and not file.startswith('__'):
+                py_files.append(os.path.join(root, file))
+    return sorted(py_files)
+
+
+manifest = Manifest()
+history = History()
 
-processes = []
-for f in py_files:
-    module = str(f).removesuffix('.py').replace('/', '.')
+# Convert any raw logs that changed into the .npz files the scripts load, before we hash them
+logged = [dataset for dataset in DATASETS if dataset.logs_dir is not None]
+if logged:
+    print("Ingesting raw trajectory logs")
+    for dataset in logged:
+        for target in ingest_dataset(dataset, args.force):
+            print(f"  - {target}")
+
+# Tell the scripts where to write their phase timings.
+# The render server passes its environment on to every script, so this has to stay the same in --watch mode
+trace_dir = os.path.join(TRACES_DIR, f"{os.getpid()}.parts")
+os.environ[TRACE_DIR_ENV] = trace_dir
+trace = BuildTrace(trace_dir)
+
+# Same for the index of the trajectories we decode into shared memory
+shared = SharedTrajectories(os.path.join(".build/shared", f"{os.getpid()}.json"))
+os.environ[SHARED_DATA_ENV] = shared.index_path
+
+latex_daemon = None
+if args.latex_daemon:
+    socket_path = os.path.join(".build", f"latex-{os.getpid()}.sock")
+    latex_daemon = subprocess.Popen(["python3", "-m", "scripts.reusable_code.text_metrics", "--daemon", socket_path])
+    # Starting LaTeX takes a moment. Scripts started before the socket exists would measure text themselves
+    deadline = time.monotonic() + 30
+    while not os.path.exists(socket_path) and latex_daemon.poll() is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+    if os.path.exists(socket_path):
+        os.environ[DAEMON_ENV] = socket_path
+    else:
+        print("The LaTeX daemon didn't start, the scripts will start their own LaTeX")
+
+# Scripts that were killed because their inputs changed, and should run again once they're dead
+rerun: Set[str] = set()
+
+
+def make_job(f: str, force: bool = False) -> Job | None:
+    """ A job for the script, or None if its plots are up to date """
+    module = script_module(f)
+    # Hash the inputs before the script runs, so edits made during the build trigger another rebuild
+    inputs = manifest.hash_inputs(f)
+    # Asking for a new format has to rebuild the plot too
+    inputs["--formats"] = os.environ[FORMATS_ENV]
+    if not force and manifest.is_current(f, inputs):
+        print(f"  - {module} (up to date)")
+        return None
     print(f"  - {module}")
-    p = subprocess.Popen(["python3", "-m", module])
-    processes.append((module, p))
+    shared.publish(path for path in inputs if path.endswith(".npz"))
+    return Job(f, module, data=inputs)
+
+
+def on_finish(job: Job):
+    # Even if it finished on its own before the kill got to it, it rendered the old inputs
+    if job.script_path in rerun:
+        print(f"  > {job.module} cancelled, its inputs changed")
+        rerun.discard(job.script_path)
+        new_job = make_job(job.script_path)
+        if new_job is not None:
+            scheduler.submit(new_job)
+        return
+
+    print(f"  > {job.module} finished with exit code {job.returncode} in {job.duration:.1f}s")
+    # The files the script says it saved. Scripts that don't use export.save() only write the .pgf
+    outputs = trace.add_job(job) or [os.path.join(PLOTS_DIR, f"{plot_name(job.script_path)}.pgf")]
+    if job.returncode == 0 and all(os.path.isfile(output) for output in outputs):
+        manifest.record(job.script_path, job.data, outputs)
+    else:
+        manifest.forget(job.script_path)
+
+
+def finish_build():
+    global trace
+    manifest.save()
+    history.save()
+    trace.save()
+    trace = BuildTrace(trace_dir)
+
+print("Running all python scripts in ./scripts")
+try:
+    jobs = [job for job in (make_job(f, args.force) for f in find_scripts()) if job is not None]
+
+    memory_budget = args.memory_budget * 1024 * 1024 if args.memory_budget is not None else available_memory()
+    print(f"\nRunning {len(jobs)} scripts, {args.jobs} at a time")
+
+    runner = SubprocessRunner() if args.no_server else ForkServerRunner()
+    scheduler = Scheduler(runner, history, workers=args.jobs, memory_budget=memory_budget, on_finish=on_finish)
+    for job in jobs:
+        scheduler.submit(job)
+    while scheduler.busy():
+        scheduler.step()
+    finish_build()
+
+    if args.watch:
+        def rebuild(scripts: List[str]):
+            for f in scripts:
+                module = script_module(f)
+                if scheduler.is_running(module):
+                    # Kill the render that's using the old inputs, on_finish starts it again
+                    scheduler.cancel(module)
+                    rerun.add(f)
+                    continue
+                scheduler.cancel(module)
+                job = make_job(f)
+                if job is not None:
+                    scheduler.submit(job)
 
-print("\nWaiting for scripts to finish")
+        watcher = Watcher(find_scripts, rebuild)
+        print(f"\nWatching {', '.join(d + '/' for d in WATCH_DIRS)} for changes. Press Ctrl+C to stop")
+        try:
+            while True:
+                watcher.poll()
+                if scheduler.busy():
+                    scheduler.step(timeout=POLL_INTERVAL)
+                    if not scheduler.busy():
+                        finish_build()
+                        print("Watching for changes...")
+                else:
+                    time.sleep(POLL_INTERVAL)
+        except KeyboardInterrupt:
+            print()
 
-# Wait for all to finish
-for script, p in processes:
-    p.wait()
-    print(f"  > {script} finished with exit code {p.returncode}")
+    runner.close()
+finally:
+    # Unlink the shared memory, even if the build crashed or was interrupted
+    shared.close()
+    if latex_daemon is not None:
+        latex_daemon.terminate()
+        latex_daemon.wait()
 
 print("Finished generating .pgf plots in ./plots!")
 print()
-print("Now: ")
-print("1. Open overleaf at https://www.overleaf.com/project/683813102d4472a9b9234233")
-print("2. delete all the /plots folder on overleaf")
-print("3. drag and drop ./plots into overleaf")
-print("4. recompile in overleaf")
+bundle = Bundler().make_bundle()
+if bundle is None:
+    print("No plots changed since the last upload")
+else:
+    print(f"{len(bundle['changed'])} plots changed and {len(bundle['deleted'])} were deleted since the last upload")
+    print()
+    print("Now: ")
+    print("1. Open overleaf at https://www.overleaf.com/project/683813102d4472a9b9234233")
+    print(f"2. unzip {bundle['bundle']} and drag and drop its files into the /plots folder on overleaf")
+    for name in bundle["deleted"]:
+        print(f"   delete /plots/{name} on overleaf")
+    print("3. recompile in overleaf")
 print()
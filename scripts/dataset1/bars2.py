@@ -3,19 +3,10 @@
 # Example histogram plot
 # This is based on this article: https://blog.timodenk.com/exporting-matplotlib-plots-to-latex/
 
-import matplotlib
-import numpy as np
-import matplotlib.pyplot as plt
-import os
-from matplotlib.collections import LineCollection
-
 from scripts.reusable_code.constants import TEXTWIDTH
-from matplotlib.lines import Line2D
-from typing import List
-from matplotlib.container import BarContainer
-import pandas as pd
-import matplotlib.transforms as mtransforms
+from scripts.reusable_code import export, style
 
+# Both only import matplotlib and pandas once they plot, so importing them here is cheap
 from scripts.dataset1 import performance
 from scripts.dataset1 import power
 
@@ -35,20 +26,10 @@ fig_height = fig_width * 0.65 * 0.66666666  # 3:2 aspect ratio
 cmap_name = "plasma"
 
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
     # Make the graph export to .pgf, to be used by LaTeX
-    if not INTERACTIVE:
-        matplotlib.rcParams.update({
-            "pgf.texsystem": "pdflatex",
-            'font.family': 'serif',
-            'text.usetex': True,
-            'pgf.rcfonts': False,
-            "savefig.transparent": True,
-            "savefig.dpi": 300,
-            # prevent rasterization
-        })
-        matplotlib.use("pgf")
-    else:
-        matplotlib.use("TkAgg")
+    style.configure(INTERACTIVE)
 
     # create figure and axes from above config
     fig, (ax1, ax2) = plt.subplots(ncols=2, figsize=(fig_width, fig_height), gridspec_kw={'width_ratios': [60, 50]})
@@ -56,17 +37,10 @@ if __name__ == "__main__":
     performance.plot(fig, ax1)
     power.plot(fig, ax2)
 
-    # Generate the name of the plot based on the name of this python file
-    # Absolute path of the current file
-    current_script_file = os.path.abspath(__file__)
-    # Relative path from the current working directory
-    relative_path = os.path.relpath(current_script_file, start=os.getcwd())
-    filename = relative_path.removesuffix('.py').removeprefix('scripts/').replace('/', '.')
-
     # Interactive preview
     if INTERACTIVE:
         plt.plot()
         plt.show()
     else:
-        # Save PGF for LaTeX
-        plt.savefig(f'plots/{filename}.pgf')
+        # Save PGF for LaTeX, and any previews build.py asked for
+        export.save(plt.gcf(), __file__)
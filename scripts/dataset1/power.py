@@ -3,19 +3,9 @@
 # Example histogram plot
 # This is based on this article: https://blog.timodenk.com/exporting-matplotlib-plots-to-latex/
 
-import matplotlib
 import numpy as np
-import matplotlib.pyplot as plt
-import os
-from matplotlib.collections import LineCollection
 from scripts.reusable_code.constants import TEXTWIDTH
-from matplotlib.lines import Line2D
-from typing import List
-from matplotlib.container import BarContainer
-import pandas as pd
-import matplotlib.transforms as mtransforms
-import colorsys
-import matplotlib.colors as mcol
+from scripts.reusable_code import export, style, timing
 
 # use this to preview the graph
 INTERACTIVE = False
@@ -29,6 +19,13 @@ width = 5/11
 cmap_name = "plasma"
 
 def plot(fig, ax1):
+    # Only imported to draw, so bars2.py can import this module without loading them
+    import colorsys
+    import matplotlib.colors as mcol
+    import matplotlib.pyplot as plt
+    import matplotlib.transforms as mtransforms
+    import pandas as pd
+
     data = {
         "SLAM System": ["RTABMap-SLAM\n(LiDAR)", "ORB-SLAM3\n(RGBD)", "DROID-SLAM\n(RGBD)", "ORB-SLAM3\n(Mono)", "DROID-SLAM\n(Mono)", "MASt3R-SLAM\n(Mono)", "AnyFeature-VSLAM\n(Mono)"],
         "Total Power Consumption (Wh)": [x for x in [2.28, 1.8, 2.06, 3.64, 3.79, 3.58, 1.95]],
@@ -116,7 +113,8 @@ def plot(fig, ax1):
         label.set_transform(label.get_transform() + offset)
     ax1.xaxis.label.set_visible(False)
 
-    fig.tight_layout()
+    with timing.phase("tight_layout"):
+        fig.tight_layout()
 
 
 if __name__ == "__main__":
@@ -124,36 +122,19 @@ if __name__ == "__main__":
     fig_width = width * TEXTWIDTH
     fig_height = TEXTWIDTH * 0.65 * 0.66666  # 3:2 aspect ratio
 
+    import matplotlib.pyplot as plt
+
     # Make the graph export to .pgf, to be used by LaTeX
-    if not INTERACTIVE:
-        matplotlib.rcParams.update({
-            "pgf.texsystem": "pdflatex",
-            'font.family': 'serif',
-            'text.usetex': True,
-            'pgf.rcfonts': False,
-            "savefig.transparent": True,
-            "savefig.dpi": 300,
-            # prevent rasterization
-        })
-        matplotlib.use("pgf")
-    else:
-        matplotlib.use("TkAgg")
+    style.configure(INTERACTIVE)
 
     # create figure and axes from above config
     fig, ax1 = plt.subplots(figsize=(fig_width, fig_height))
     plot(fig, ax1)
 
-    # Generate the name of the plot based on the name of this python file
-    # Absolute path of the current file
-    current_script_file = os.path.abspath(__file__)
-    # Relative path from the current working directory
-    relative_path = os.path.relpath(current_script_file, start=os.getcwd())
-    filename = relative_path.removesuffix('.py').removeprefix('scripts/').replace('/', '.')
-
     # Interactive preview
     if INTERACTIVE:
         plt.plot()
         plt.show()
     else:
-        # Save PGF for LaTeX
-        plt.savefig(f'plots/{filename}.pgf')
+        # Save PGF for LaTeX, and any previews build.py asked for
+        export.save(plt.gcf(), __file__)
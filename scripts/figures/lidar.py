@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+
+# The trajectory of the lidar system next to the RTK GPS, and its error over time
+# Drawn for every dataset in scripts/reusable_code/datasets.py, e.g. plots/dataset1.lidar.pgf and plots/damaged.lidar.pgf
+
+import numpy as np
+from scripts.reusable_code.constants import TEXTWIDTH
+from scripts.reusable_code import datasets, metrics, style, timing
+from scripts.reusable_code.datasets import Dataset
+from scripts.reusable_code.trajectory_plots import OdomPlot, RmsePlot
+from typing import List
+
+# use this to preview the graph
+INTERACTIVE = False
+# INTERACTIVE = True
+
+# The width of the plot, as a scalar to textwidth
+# Check the value used after {R} in \begin{wrapfigure} for the plot is the same
+width = 1
+
+# https://matplotlib.org/stable/users/explain/colors/colormaps.html
+cmap_name = "plasma"
+
+# Configure the size of the figure
+fig_width = width * TEXTWIDTH
+fig_height = fig_width * 0.5 # 3:2 aspect ratio
+
+
+def render(dataset: Dataset):
+    # Only imported to draw, so importing the script (e.g. for its settings) doesn't load matplotlib
+    import matplotlib
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+    from matplotlib.lines import Line2D
+
+    gps_raw_data = dataset.load_ground_truth()
+    x = gps_raw_data[:,0]
+    y = gps_raw_data[:,1]
+
+    # We plot them when we construct the legend
+    odom_plots: List[OdomPlot] = [
+        OdomPlot(system.name, color=system.color, linestyle="dashed", lw=1, zorder=2,
+                 raw_data=dataset.load(system))
+        for system in dataset.with_mode("Lidar")
+    ]
+
+    # The errors against the GPS (see metrics.py)
+    errors = metrics.for_dataset(dataset, dataset.with_mode("Lidar"))
+    rmse_plots: List[RmsePlot] = [
+        RmsePlot(errors, i, system.name, color=system.color)
+        for i, system in enumerate(dataset.with_mode("Lidar"))
+    ]
+
+    # create figure and axes from above config
+    fig, (ax1, ax2) = plt.subplots(ncols=2, figsize=(fig_width, fig_height))
+
+    # Below is some example plotting from the article:
+    # ------------------------------------------------
+
+
+
+
+    # Plot RTK GPS
+    # ------------------------------------------------
+    # Try color the line differently over time
+    with timing.phase("LineCollection"):
+        t = np.arange(len(x))  # time steps
+        points = np.array([x, y]).T.reshape(-1, 1, 2)
+        segments = np.concatenate([points[:-1], points[1:]], axis=1)
+        lc = LineCollection(segments, cmap=cmap_name, norm=plt.Normalize(t.min(), t.max()))
+        lc.set_array(t)
+        lc.set_linewidth(2)
+        lc.set_linestyle("solid")
+        lc.set_rasterized(False)
+        ax1.add_collection(lc)
+        ax1.autoscale()
+
+    # Create color bar on the side to show gradient
+    cmap = plt.get_cmap(cmap_name)
+    sm = matplotlib.cm.ScalarMappable(cmap=cmap, norm=plt.Normalize(t.min(), t.max()))
+    sm.set_array([])  # required, but array is empty
+
+    ticks = np.linspace(t.min(), t.max(), 11)
+
+    # Add the RTK GPS line to the legend with a proxy artist
+    colors = cmap(np.linspace(0, 1, 256))  # RGBA array
+    avg_color = colors[:, :3].mean(axis=0)  # average RGB (ignore alpha)
+    proxy = Line2D([0], [0], color=avg_color, linestyle="solid", lw=1.5)  # representative color
+
+    # ------------------------------------------------
+
+    # Layout:
+    # ax.set_title(r'Histogram of IQ: $\mu=100$, $\sigma=15$')
+
+    start_point = ax1.scatter([x[0]], [y[0]], c=colors[0], marker="o", )
+
+    ax1.legend(
+        [proxy, start_point] + [odom.plot(ax1) for odom in odom_plots],
+        ["RTK GPS Trajectory", "GPS \& Odom Start"] + [odom.legend_name() for odom in odom_plots],
+        fontsize=6,       # font size
+        labelspacing=0.125, # vertical spacing between entries
+        handlelength=1.5, # length of lines in legend
+        handleheight=1,   # height of line box
+        markerscale=0.5,  # scale of markers
+        borderaxespad=0.2 # padding around legend
+    )
+    ax1.set_xlabel('X Position (m)', fontsize=9)
+    ax1.set_ylabel('Y Position (m)', fontsize=9)
+
+    # ----------------------------------------------------
+    [odom.plot_distance(ax2) for odom in rmse_plots]
+    ax2.legend(
+        [odom.plot_cumulative_rmse(ax2) for odom in rmse_plots],
+        [odom.name for odom in rmse_plots],
+        fontsize=6,       # font size
+        labelspacing=0.125, # vertical spacing between entries
+        handlelength=1.2, # length of lines in legend
+        handleheight=1,   # height of line box
+        markerscale=0.5,  # scale of markers
+        borderaxespad=0.2 # padding around legend
+    )
+    # ax2.set_xlabel('Time', fontsize=9)
+    ax2.tick_params(axis='x', which='both', bottom=False, top=True, labelbottom=False)
+    ax2.autoscale()
+
+    ax2.set_ylabel('Cumulative RMSE (solid) (m)\nAbsolute Trajectory Error (dashed) (m)', fontsize=9)
+    ax2.set_xlim(errors.gt_t[0], errors.gt_t[-1])
+
+    # Smaller tick labels
+    plt.xticks(fontsize=6)
+    plt.yticks(fontsize=6)
+
+    # plt.legend()
+
+    with timing.phase("tight_layout"):
+        fig.tight_layout()
+
+    # Get the position of the main axes in figure coordinates
+    pos = ax2.get_position()
+    # Create a new Axes for the colorbar directly below it
+    cax_height = 0.036   # height of colorbar as fraction of figure
+    cax_pad = -cax_height      # gap between plot and colorbar
+    cax = fig.add_axes([
+        pos.x0,                      # left aligned with ax
+        pos.y0 - cax_height - cax_pad,  # directly below ax
+        pos.width,                   # same width as ax
+        cax_height                   # defined height
+    ])
+
+    cbar = plt.colorbar(sm, ax=ax2, cax=cax, orientation="horizontal", ticks=ticks)
+
+    cbar.set_label("Time", fontsize=9)
+    cbar.ax.minorticks_off()
+    cbar.ax.tick_params(labelsize=6)
+    cbar.set_ticks([])            # no ticks
+    cbar.set_ticklabels([])       # no labels (optional, usually redundant)
+    cbar.ax.tick_params(size=0, labelsize=0)  # hides ticks and labels
+    cbar.solids.set_rasterized(False)
+
+    return fig
+
+
+if __name__ == "__main__":
+    # Make the graph export to .pgf, to be used by LaTeX
+    style.configure(INTERACTIVE)
+    datasets.render_all(render, __file__, INTERACTIVE)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+
+# The trajectory of every system next to the RTK GPS, and their error over time
+# Drawn for every dataset in scripts/reusable_code/datasets.py, e.g. plots/dataset1.path.pgf and plots/damaged.path.pgf
+
+import numpy as np
+
+from scripts.reusable_code.constants import TEXTWIDTH
+from scripts.reusable_code import datasets, metrics, style, timing
+from scripts.reusable_code.bootstrap import bootstrap
+from scripts.reusable_code.datasets import Dataset
+from scripts.reusable_code.rpe import relative_error
+from scripts.reusable_code.trajectory_plots import OdomPlot, RmsePlot, RpePlot
+from typing import List
+
+# use this to preview the graph
+INTERACTIVE = False
+# INTERACTIVE = True
+
+# The width of the plot, as a scalar to textwidth
+# Check the value used after {R} in \begin{wrapfigure} for the plot is the same
+width = 1
+
+# Line each system up with the GPS before measuring its error (see alignment.py): None for the raw positions, or
+# "se2" (rotation and translation) or "sim2" (and scale, for the monocular systems)
+ALIGNMENT = None
+# Align on only the first this many poses of each system, or None for the whole run
+ALIGN_FIRST = None
+
+# Draw each system's Relative Pose Error over this many poses (see rpe.py) on the right, instead of its ATE and
+# cumulative RMSE. None for the ATE, and RPE_UNIT = "seconds" for a time delta
+RPE_DELTA = None
+RPE_UNIT = "poses"
+
+# Print a block bootstrap confidence interval (see bootstrap.py) next to each RMSE in the table, or None to leave it out
+CONFIDENCE = 0.95
+
+# https://matplotlib.org/stable/users/explain/colors/colormaps.html
+cmap_name = "plasma"
+
+# Configure the size of the figure
+fig_width = width * TEXTWIDTH
+fig_height = fig_width * 0.5 # 3:2 aspect ratio
+
+
+def render(dataset: Dataset):
+    # Only imported to draw, so importing the script (e.g. for its settings) doesn't load matplotlib
+    import matplotlib
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection, PathCollection
+    from matplotlib.lines import Line2D
+    from matplotlib.markers import MarkerStyle
+    from matplotlib.transforms import IdentityTransform
+
+    gps_raw_data = dataset.load_ground_truth()
+    x = gps_raw_data[:,0]
+    y = gps_raw_data[:,1]
+
+    # The errors of every system against the GPS, computed together (see metrics.py)
+    raw_errors = metrics.for_dataset(dataset)
+    errors = raw_errors if ALIGNMENT is None else raw_errors.aligned(ALIGNMENT, ALIGN_FIRST)
+
+    # Add new systems to the dataset in datasets.py!
+    # We plot them when we construct the legend
+    odom_plots: List[OdomPlot] = [
+        OdomPlot(system.name, color=system.color, raw_data=errors.positions[i, errors.row(i)])
+        for i, system in enumerate(dataset.systems)
+    ]
+
+    rmse_plots: List[RmsePlot] = [
+        RmsePlot(errors, i, system.name, color=system.color)
+        for i, system in enumerate(dataset.systems)
+    ]
+
+    # create figure and axes from above config
+    fig, (ax1, ax2) = plt.subplots(ncols=2, figsize=(fig_width, fig_height))
+
+    # Below is some example plotting from the article:
+    # ------------------------------------------------
+
+    for odom in odom_plots:
+        odom.plot(ax1)
+
+    # Plot RTK GPS
+    # ------------------------------------------------
+    # Try color the line differently over time
+    with timing.phase("LineCollection"):
+        t = np.arange(len(x))  # time steps
+        points = np.array([x, y]).T.reshape(-1, 1, 2)
+        segments = np.concatenate([points[:-1], points[1:]], axis=1)
+        lc = LineCollection(segments, cmap=cmap_name, norm=plt.Normalize(t.min(), t.max()), zorder=10)
+        lc.set_array(t)
+        lc.set_linewidth(1.5)
+        lc.set_linestyle("solid")
+        lc.set_rasterized(False)
+        ax1.add_collection(lc)
+        ax1.autoscale()
+
+    # Create color bar on the side to show gradient
+    cmap = plt.get_cmap(cmap_name)
+    sm = matplotlib.cm.ScalarMappable(cmap=cmap, norm=plt.Normalize(t.min(), t.max()))
+    sm.set_array([])  # required, but array is empty
+
+    ticks = np.linspace(t.min(), t.max(), 11)
+
+    # Add the RTK GPS line to the legend with a proxy artist
+    colors = cmap(np.linspace(0, 1, 256))  # RGBA array
+    avg_color = colors[:, :3].mean(axis=0)  # average RGB (ignore alpha)
+    proxy = Line2D([0], [0], color=avg_color, linestyle="solid", lw=1.5)  # representative color
+
+    # ------------------------------------------------
+
+    # Layout:
+    # ax.set_title(r'Histogram of IQ: $\mu=100$, $\sigma=15$')
+
+    start_point = ax1.scatter([x[0]], [y[0]], c=colors[0], marker="o", )
+    end_point = ax1.scatter([x[len(x)-1]], [y[len(y)-1]], c=colors[len(colors)-1], marker="X", lw=0.65/2, zorder=-10)
+
+    endpoint_marker = MarkerStyle("X")
+    enpoint_proxy_path = endpoint_marker.get_path().transformed(endpoint_marker.get_transform())
+    endpoint_proxy = PathCollection([enpoint_proxy_path], sizes=[100], facecolors=np.array([[0,0,0,1]]), transOffset=IdentityTransform(), offsets=np.array([[0,0]]))  # representative color
+    endpoint_proxy.set_transform(IdentityTransform())
+
+    ax1.legend(
+        [proxy, start_point] + [odom.plot(ax1) for odom in odom_plots] + [endpoint_proxy],
+        ["RTK GPS Trajectory", "GPS \& Odom Start"] + [odom.legend_name() for odom in odom_plots] + ["Trajectory Endpoint"],
+        fontsize=6,       # font size
+        labelspacing=0.125, # vertical spacing between entries
+        handlelength=1.5, # length of lines in legend
+        handleheight=1,   # height of line box
+        markerscale=0.5,  # scale of markers
+        borderaxespad=0.2 # padding around legend
+    )
+    [odom.plot_endpoint(ax1) for odom in odom_plots]
+    ax1.set_xlabel('X Position (m)', fontsize=9)
+    ax1.set_ylabel('Y Position (m)', fontsize=9)
+
+    # ----------------------------------------------------
+    if RPE_DELTA is None:
+        [odom.plot_distance(ax2) for odom in rmse_plots]
+        handles = [odom.plot_cumulative_rmse(ax2) for odom in rmse_plots]
+        ylabel = 'Cumulative RMSE (solid) (m)\nAbsolute Trajectory Error (dashed) (m)'
+    else:
+        rpe = relative_error(errors, [RPE_DELTA], RPE_UNIT)
+        rpe_plots: List[RpePlot] = [
+            RpePlot(rpe, i, 0, system.name, color=system.color)
+            for i, system in enumerate(dataset.systems)
+        ]
+        handles = [odom.plot(ax2) for odom in rpe_plots]
+        ylabel = f'Relative Pose Error over {rpe.delta_name(0)} (m)'
+    ax2.legend(
+        handles,
+        [odom.name for odom in rmse_plots],
+        fontsize=6,       # font size
+        labelspacing=0.125, # vertical spacing between entries
+        handlelength=1.2, # length of lines in legend
+        handleheight=1,   # height of line box
+        markerscale=0.5,  # scale of markers
+        borderaxespad=0.2 # padding around legend
+    )
+    # ax2.set_xlabel('Time', fontsize=9)
+    ax2.tick_params(axis='x', which='both', bottom=False, top=True, labelbottom=False)
+    ax2.autoscale()
+
+    ax2.set_ylabel(ylabel, fontsize=7.5)
+    ax2.set_xlim(errors.gt_t[0], errors.gt_t[-1])
+
+    # Smaller tick labels
+    plt.xticks(fontsize=6)
+    plt.yticks(fontsize=6)
+    ax1.tick_params(axis='x', labelsize=6)  # x-axis tick labels
+    ax1.tick_params(axis='y', labelsize=6)  # y-axis tick labels
+    ax2.tick_params(axis='x', labelsize=6)  # x-axis tick labels
+    ax2.tick_params(axis='y', labelsize=6)  # y-axis tick labels
+
+    # plt.legend()
+
+    with timing.phase("tight_layout"):
+        fig.tight_layout()
+
+    # Get the position of the main axes in figure coordinates
+    pos = ax2.get_position()
+    # Create a new Axes for the colorbar directly below it
+    cax_height = 0.036   # height of colorbar as fraction of figure
+    cax_pad = -cax_height      # gap between plot and colorbar
+    cax = fig.add_axes([
+        pos.x0,                      # left aligned with ax
+        pos.y0 - cax_height - cax_pad,  # directly below ax
+        pos.width,                   # same width as ax
+        cax_height                   # defined height
+    ])
+
+    cbar = plt.colorbar(sm, ax=ax2, cax=cax, orientation="horizontal", ticks=ticks)
+
+    cbar.set_label("Time", fontsize=9)
+    cbar.ax.minorticks_off()
+    cbar.ax.tick_params(labelsize=6)
+    cbar.set_ticks([])            # no ticks
+    cbar.set_ticklabels([])       # no labels (optional, usually redundant)
+    cbar.ax.tick_params(size=0, labelsize=0)  # hides ticks and labels
+    cbar.solids.set_rasterized(False)
+
+    print(dataset.name)
+    interval = None if CONFIDENCE is None else bootstrap(errors, confidence=CONFIDENCE)
+    for i, odom in enumerate(rmse_plots):
+        rmse = odom.cumulative_rmse[len(odom.cumulative_rmse)-1]
+        row = [odom.name, "&", rmse] if ALIGNMENT is None else [odom.name, "&", raw_errors.rmse[i], "&", rmse]
+        if interval is not None:
+            row += ["&", f"[{interval.rmse_low[i]:.3f}, {interval.rmse_high[i]:.3f}]"]
+        print(*row)
+
+    return fig
+
+
+if __name__ == "__main__":
+    # Make the graph export to .pgf, to be used by LaTeX
+    style.configure(INTERACTIVE)
+    datasets.render_all(render, __file__, INTERACTIVE)
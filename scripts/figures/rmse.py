@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+# The distance to the GPS and the cumulative RMS error of a couple of systems over time
+# Drawn for every dataset in scripts/reusable_code/datasets.py, e.g. plots/dataset1.rmse.pgf and plots/damaged.rmse.pgf
+
+from scripts.reusable_code.constants import TEXTWIDTH
+from scripts.reusable_code import datasets, metrics, style, timing
+from scripts.reusable_code.datasets import Dataset
+from scripts.reusable_code.trajectory_plots import RmsePlot
+from typing import List
+
+# use this to preview the graph
+INTERACTIVE = False
+# INTERACTIVE = True
+
+# The width of the plot, as a scalar to textwidth
+# Check the value used after {R} in \begin{wrapfigure} for the plot is the same
+width = 0.65
+
+# https://matplotlib.org/stable/users/explain/colors/colormaps.html
+cmap_name = "plasma"
+
+# Configure the size of the figure
+fig_width = width * TEXTWIDTH
+fig_height = fig_width * 0.8 # 3:2 aspect ratio
+
+# The systems to compare, if the dataset has them
+FILES = ["rtabmap_slam_traj", "orb_slam3_traj"]
+
+
+def render(dataset: Dataset):
+    # Only imported to draw, so importing the script (e.g. for its settings) doesn't load matplotlib
+    import matplotlib.pyplot as plt
+
+    systems = [system for system in dataset.systems if system.file in FILES]
+    # The errors against the GPS, computed together (see metrics.py)
+    errors = metrics.for_dataset(dataset, systems)
+
+    # We plot them when we construct the legend
+    odom_plots: List[RmsePlot] = [
+        RmsePlot(errors, i, system.name, color=system.color)
+        for i, system in enumerate(systems)
+    ]
+
+    # create figure and axes from above config
+    fig, ax = plt.subplots(figsize=(fig_width, fig_height))
+
+    # Below is some example plotting from the article:
+    # ------------------------------------------------
+
+
+
+
+    # Plot RTK GPS
+    # ------------------------------------------------
+    # Try color the line differently over time
+    # t = np.arange(len(x))  # time steps
+    # points = np.array([x, y]).T.reshape(-1, 1, 2)
+    # segments = np.concatenate([points[:-1], points[1:]], axis=1)
+    # lc = LineCollection(segments, cmap=cmap_name, norm=plt.Normalize(t.min(), t.max()))
+    # lc.set_array(t)
+    # lc.set_linewidth(2)
+    # lc.set_linestyle("solid")
+    # lc.set_rasterized(False)
+    # ax.add_collection(lc)
+    # ax.autoscale()
+    #
+    # # Create color bar on the side to show gradient
+    # cmap = plt.get_cmap(cmap_name)
+    # sm = matplotlib.cm.ScalarMappable(cmap=cmap, norm=plt.Normalize(t.min(), t.max()))
+    # sm.set_array([])  # required, but array is empty
+    #
+    # ticks = np.linspace(t.min(), t.max(), 11)
+    # cbar = plt.colorbar(sm, ax=ax, ticks=ticks)
+    # cbar.set_label("Time (s)", fontsize=9)
+    # cbar.ax.minorticks_off()
+    # cbar.ax.tick_params(labelsize=6)
+    # cbar.solids.set_rasterized(False)
+    #
+    # # Add the RTK GPS line to the legend with a proxy artist
+    # colors = cmap(np.linspace(0, 1, 256))  # RGBA array
+    # avg_color = colors[:, :3].mean(axis=0)  # average RGB (ignore alpha)
+    # proxy = Line2D([0], [0], color=avg_color, linestyle="solid", lw=1.5)  # representative color
+
+    # ------------------------------------------------
+
+    # Layout:
+    # ax.set_title(r'Histogram of IQ: $\mu=100$, $\sigma=15$')
+
+    # start_point = plt.scatter([x[0]], [y[0]], c=colors[0], marker="o", )
+
+    ax.legend(
+        [odom.plot_distance(ax) for odom in odom_plots] + [odom.plot_cumulative_rmse(ax) for odom in odom_plots],
+        [odom.legend_name_distance() for odom in odom_plots] + [odom.legend_name_error() for odom in odom_plots],
+        fontsize=6,       # font size
+        labelspacing=0.125, # vertical spacing between entries
+        handlelength=1.5, # length of lines in legend
+        handleheight=1,   # height of line box
+        markerscale=0.5,  # scale of markers
+        borderaxespad=0.2 # padding around legend
+    )
+    ax.set_xlabel('Time', fontsize=9)
+    ax.set_ylabel('Distance to GPS (m)', fontsize=9)
+
+    # Smaller tick labels
+    plt.xticks(fontsize=6)
+    plt.yticks(fontsize=6)
+
+    # plt.legend()
+
+    with timing.phase("tight_layout"):
+        fig.tight_layout()
+
+    return fig
+
+
+if __name__ == "__main__":
+    # Make the graph export to .pgf, to be used by LaTeX
+    style.configure(INTERACTIVE)
+    datasets.render_all(render, __file__, INTERACTIVE)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+# The error of every system as a LaTeX table, without drawing anything
+# Written for every dataset in scripts/reusable_code/datasets.py, e.g. plots/dataset1.tables.tex, to \input{} in the
+# thesis inside a table environment.
+#
+# These are the numbers path.py prints under its figure, but path.py needs matplotlib, LaTeX and a whole figure to get
+# to them. This only imports numpy and the metrics (don't import matplotlib, or anything that does, like export.py),
+# so refreshing the table takes a fraction of a plotting run, and a warm derived cache (see derived.py) even less.
+#
+# One row per system: the RMSE of the valid poses (the last value of the cumulative RMSE curve in rmse.py, which is
+# the same number), and the mean, median and max of the ATE. Set ALIGNMENT to add the RMSE after aligning, and
+# CONFIDENCE for a bootstrap interval of it.
+
+import os
+from typing import List
+
+import numpy as np
+
+from scripts.reusable_code import datasets, integrity, metrics, timing
+from scripts.reusable_code.bootstrap import bootstrap
+from scripts.reusable_code.datasets import Dataset
+
+PLOTS_DIR = "plots"
+
+# Add a column with the RMSE after aligning every system with the GPS ("se2", "sim2", "se3" or "sim3",
+# see alignment.py), or None for just the raw RMSE. Uses the first ALIGN_FIRST poses, or all of them if None
+ALIGNMENT = None
+ALIGN_FIRST = None
+
+# Add a column with a block bootstrap confidence interval (see bootstrap.py) of the last RMSE, or None to leave it out
+CONFIDENCE = 0.95
+
+# Decimal places of every number in the table
+DECIMALS = 3
+
+# Characters that mean something to LaTeX, in system names
+LATEX_SPECIAL = {"&": r"\&", "%": r"\%", "$": r"\$", "#": r"\#", "_": r"\_", "{": r"\{", "}": r"\}"}
+
+
+def escape(text: str) -> str:
+    return "".join(LATEX_SPECIAL.get(c, c) for c in text)
+
+
+def number(value: float) -> str:
+    """ A value for the table, -- if there isn't one (a system without valid poses) """
+    return "--" if np.isnan(value) else f"{value:.{DECIMALS}f}"
+
+
+def table(dataset: Dataset) -> str:
+    """ The tabular of every system's error """
+    errors = metrics.for_dataset(dataset)
+    header = ["System", "RMSE (m)", "Mean (m)", "Median (m)", "Max (m)"]
+    columns = [errors.rmse, errors.mean, errors.median(), errors.max]
+    if ALIGNMENT is not None:
+        errors = errors.aligned(ALIGNMENT, ALIGN_FIRST)
+        header.append(f"{ALIGNMENT.upper()} RMSE (m)")
+        columns.append(errors.rmse)
+    interval = None
+    if CONFIDENCE is not None:
+        interval = bootstrap(errors, confidence=CONFIDENCE)
+        header.append(f"{CONFIDENCE:.0%} interval (m)".replace("%", r"\%"))
+
+    rows: List[str] = []
+    for i, name in enumerate(errors.names):
+        row = [escape(name)] + [number(column[i]) for column in columns]
+        if interval is not None:
+            row.append(f"[{number(interval.rmse_low[i])}, {number(interval.rmse_high[i])}]")
+        rows.append(" & ".join(row) + r" \\")
+
+    return "\n".join([
+        f"% {dataset.name}, written by scripts/figures/tables.py",
+        r"\begin{tabular}{l" + "r" * (len(header) - 1) + "}",
+        r"\hline",
+        " & ".join(header) + r" \\",
+        r"\hline",
+        *rows,
+        r"\hline",
+        r"\end{tabular}",
+        "",
+    ])
+
+
+def write_if_changed(text: str, path: str):
+    """ Writes path in one go, unless it already says the same, so bundle.py doesn't upload it again """
+    try:
+        with open(path) as f:
+            if f.read() == text:
+                return
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+if __name__ == "__main__":
+    for dataset in datasets.DATASETS:
+        dataset.preload()
+        with timing.phase("integrity"):
+            integrity.scan(dataset).check()
+        with timing.phase(f"table {dataset.name}"):
+            text = table(dataset)
+        path = os.path.join(PLOTS_DIR, f"{datasets.figure_filename(dataset, __file__)}.tex")
+        write_if_changed(text, path)
+        timing.record_output(path)
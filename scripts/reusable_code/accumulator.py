@@ -0,0 +1,225 @@
+# Keeps a system's error up to date as poses are appended to its run, without going over the old poses again
+#
+# metrics.py works out the error of the whole run every time a script runs, which is what the figures need. But for a
+# run that is still being recorded (or a log that ingest.py appends to), only the new poses have changed.
+# An ErrorAccumulator holds everything the error needs from the poses it has already seen:
+#
+#  - the number of valid poses, and the sums of their squared errors and errors, for the RMSE and mean ATE
+#  - the min and max error
+#  - a QuantileSketch of the errors, for the median and other percentiles
+#
+# append() takes the next chunk of poses and their ground truth, and returns the new RMSE and the cumulative RMSE of
+# the chunk's poses (the tail of metrics.cumulative_rmse), in time that only depends on the size of the chunk.
+#
+# The state is small (a few numbers and the sketch's buckets) and is saved as a .npz in .build/accumulators/, with
+# the first and last pose it saw. resume() gives it back to a later run, which only appends the poses after it, or a
+# new one if the run changed instead of growing. That only compares those two poses, so it doesn't rescan the run:
+# it catches a run that was re-recorded or cut short, not one edited in the middle. The CLI also only checks the new
+# poses for bad values (see integrity.py), instead of scanning the whole dataset again.
+#
+#     python3 -m scripts.reusable_code.accumulator dataset1       # the error of every system, from where we left off
+
+import math
+import os
+from typing import Tuple
+
+import numpy as np
+
+ACCUMULATOR_DIR = ".build/accumulators"
+
+# How far off (relatively) a quantile from the sketch can be
+RELATIVE_ACCURACY = 0.01
+
+
+class QuantileSketch:
+    """
+    Streaming quantiles of positive values, with a bounded relative error (like DDSketch)
+
+    Each value goes in the bucket ceil(log(value) / log(gamma)), and a quantile is read off the cumulative counts of
+    the buckets. Every value in a bucket is within relative_accuracy of the bucket's middle, so the quantiles are
+    too. Errors from millimetres to kilometres take ~1000 buckets.
+    """
+    def __init__(self, relative_accuracy: float = RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        # counts[i] is the number of values in bucket offset + i
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+        # Values too small to take a log of
+        self.zeros = 0
+
+    def add(self, values: np.ndarray):
+        values = np.asarray(values, dtype=float)
+        positive = values[values > 0]
+        self.zeros += len(values) - len(positive)
+        if not len(positive):
+            return
+        keys = np.ceil(np.log(positive) / math.log(self.gamma)).astype(np.int64)
+        low = min(int(keys.min()), self.offset) if len(self.counts) else int(keys.min())
+        high = max(int(keys.max()), self.offset + len(self.counts) - 1)
+        if len(self.counts) == 0 or low < self.offset or high >= self.offset + len(self.counts):
+            # Grow the buckets to cover the new keys
+            counts = np.zeros(high - low + 1, dtype=np.int64)
+            counts[self.offset - low:self.offset - low + len(self.counts)] = self.counts
+            self.counts = counts
+            self.offset = low
+        self.counts += np.bincount(keys - self.offset, minlength=len(self.counts))
+
+    def count(self) -> int:
+        return self.zeros + int(self.counts.sum())
+
+    def quantile(self, q: float) -> float:
+        """ The value with a fraction q of the values below it, NaN if there aren't any values """
+        total = self.count()
+        if total == 0:
+            return math.nan
+        rank = q * (total - 1)
+        if rank < self.zeros:
+            return 0.0
+        bucket = int(np.searchsorted(np.cumsum(self.counts), rank - self.zeros, side="right"))
+        return 2 * self.gamma ** (self.offset + bucket) / (self.gamma + 1)
+
+
+class ErrorAccumulator:
+    """ The running error of one trajectory against its ground truth """
+    def __init__(self, relative_accuracy: float = RELATIVE_ACCURACY):
+        # Poses appended so far, valid or not
+        self.poses = 0
+        # Valid poses so far
+        self.count = 0
+        self.sum_sq = 0.0
+        self.sum_dist = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sketch = QuantileSketch(relative_accuracy)
+        # The first and last positions appended, to tell whether a run grew or changed
+        self.first = np.full(0, np.nan)
+        self.last = np.full(0, np.nan)
+
+    def append(self, positions: np.ndarray, ground_truth: np.ndarray,
+               valid: np.ndarray | None = None) -> Tuple[float, np.ndarray]:
+        """ Adds the next poses of the run, and returns the new RMSE and the cumulative RMSE at each new pose """
+        positions = np.asarray(positions, dtype=float)
+        ground_truth = np.asarray(ground_truth, dtype=float)
+        diff = positions - ground_truth
+        sqdist = np.einsum("nd,nd->n", diff, diff)
+        valid = np.isfinite(sqdist) if valid is None else valid & np.isfinite(sqdist)
+        counted = np.where(valid, sqdist, 0.0)
+
+        # The cumulative RMSE carries on from the sums so far
+        sums = np.cumsum(counted)
+        sums += self.sum_sq
+        counts = np.cumsum(valid)
+        counts += self.count
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tail = np.sqrt(sums / counts)
+
+        dist = np.sqrt(sqdist[valid])
+        self.poses += len(positions)
+        if len(counts):
+            self.count = int(counts[-1])
+        self.sum_sq += float(counted.sum())
+        self.sum_dist += float(dist.sum())
+        if len(dist):
+            self.min = min(self.min, float(dist.min()))
+            self.max = max(self.max, float(dist.max()))
+        self.sketch.add(dist)
+        if len(positions):
+            if self.poses == len(positions):
+                self.first = positions[0].copy()
+            self.last = positions[-1].copy()
+        return self.rmse(), tail
+
+    def rmse(self) -> float:
+        return math.sqrt(self.sum_sq / self.count) if self.count else math.nan
+
+    def mean(self) -> float:
+        return self.sum_dist / self.count if self.count else math.nan
+
+    def quantile(self, q: float) -> float:
+        return self.sketch.quantile(q)
+
+    def save(self, path: str):
+        """ Writes the state to a .npz, replacing the old one in one go """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # np.savez adds .npz unless the name already ends with it
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, poses=self.poses, count=self.count, sum_sq=self.sum_sq, sum_dist=self.sum_dist,
+                 min=self.min, max=self.max, first=self.first, last=self.last, relative_accuracy=self.sketch.relative_accuracy,
+                 offset=self.sketch.offset, counts=self.sketch.counts, zeros=self.sketch.zeros)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def load(path: str) -> "ErrorAccumulator":
+        with np.load(path) as state:
+            accumulator = ErrorAccumulator(float(state["relative_accuracy"]))
+            accumulator.poses = int(state["poses"])
+            accumulator.count = int(state["count"])
+            accumulator.sum_sq = float(state["sum_sq"])
+            accumulator.sum_dist = float(state["sum_dist"])
+            accumulator.min = float(state["min"])
+            accumulator.max = float(state["max"])
+            accumulator.first = state["first"]
+            accumulator.last = state["last"]
+            accumulator.sketch.offset = int(state["offset"])
+            accumulator.sketch.counts = state["counts"]
+            accumulator.sketch.zeros = int(state["zeros"])
+        return accumulator
+
+
+def resume(path: str, positions: np.ndarray) -> ErrorAccumulator:
+    """
+    The accumulator saved at path, if positions (the whole run so far) starts with the poses it saw
+
+    Otherwise (nothing saved, or the run changed rather than grew) a new one. Append positions[accumulator.poses:]
+    to it to catch up.
+    """
+    try:
+        accumulator = ErrorAccumulator.load(path)
+    except (OSError, KeyError, ValueError):
+        return ErrorAccumulator()
+    seen = accumulator.poses
+    if seen > len(positions):
+        return ErrorAccumulator()
+    if seen and not (np.array_equal(positions[0], accumulator.first, equal_nan=True)
+                     and np.array_equal(positions[seen - 1], accumulator.last, equal_nan=True)):
+        return ErrorAccumulator()
+    return accumulator
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from scripts.reusable_code import integrity
+    from scripts.reusable_code.association import associate
+    from scripts.reusable_code.datasets import BY_NAME
+
+    parser = argparse.ArgumentParser(description="The error of every system of a dataset, carrying on from last time")
+    parser.add_argument("dataset", choices=sorted(BY_NAME))
+    args = parser.parse_args()
+
+    dataset = BY_NAME[args.dataset]
+    gt_positions = dataset.load_ground_truth()
+    gt_t = dataset.load_timestamps(dataset.ground_truth)
+    for system in dataset.systems:
+        path = os.path.join(ACCUMULATOR_DIR, f"{dataset.name}.{system.file}.npz")
+        positions = dataset.load(system)
+        t = dataset.load_timestamps(system)
+        accumulator = resume(path, positions)
+        # Only the new poses are checked (see integrity.py) and matched with the ground truth. The last pose we had
+        # goes along so the first new one has a step to check, and only the ground truth around the new poses
+        start = accumulator.poses
+        before = max(start - 1, 0)
+        finite = t[start:][np.isfinite(t[start:])]
+        low, high = (np.searchsorted(gt_t, [finite.min(), finite.max()]) if len(finite) else (0, 0))
+        window = slice(max(low - 1, 0), min(high + 1, len(gt_t)))
+        report = integrity.scan_arrays(dataset.name, [dataset.ground_truth.file, system.file],
+                                       [gt_positions[window], positions[before:]], [gt_t[window], t[before:]],
+                                       dataset.max_offset)
+        usable = report.usable(system.file)[start - before:]
+        matched_gt, matched = associate(t[start:], gt_t, gt_positions, dataset.max_offset)
+        _, tail = accumulator.append(positions[start:], matched_gt, matched & usable)
+        accumulator.save(path)
+        print(f"{system.name:<20} RMSE {accumulator.rmse():.3f}, mean {accumulator.mean():.3f}, "
+              f"median {accumulator.quantile(0.5):.3f}, p90 {accumulator.quantile(0.9):.3f}, "
+              f"max {accumulator.max:.3f} ({len(tail)} new poses)")
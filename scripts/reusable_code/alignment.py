@@ -0,0 +1,109 @@
+# Lines each trajectory up with the ground truth before we measure its error (Umeyama's method)
+#
+# A SLAM system starts its map wherever it starts, facing whichever way it faces, and a monocular one doesn't know
+# the scale of the world either. So the raw error of ORB-SLAM3 (Mono) or DROID-SLAM (Mono) is mostly the rotation and
+# scale of its map, not how well it tracked. align() finds the rotation, translation (and for the sim modes, scale)
+# that puts each trajectory closest to the ground truth in the least squares sense:
+#
+#  - "se2" / "se3": rotation and translation, for x, y or x, y, z positions
+#  - "sim2" / "sim3": rotation, translation and scale
+#
+# It works on the padded (systems, samples, dims) arrays of metrics.py, and aligns every system at once: the means
+# and covariances come out of einsum over the whole stack, and np.linalg.svd decomposes all the (dims x dims)
+# covariances in one call. It can align on the whole run, or only on the first k matched poses of each system, which
+# shows how far a system drifts from where it started rather than hiding the drift in the fit.
+#
+# BatchMetrics.aligned() (metrics.py) gives you the errors after aligning, next to the raw ones.
+
+from typing import Dict, Tuple
+
+import numpy as np
+
+# mode -> (dimensions, whether to fit a scale too)
+MODES: Dict[str, Tuple[int, bool]] = {
+    "se2": (2, False),
+    "sim2": (2, True),
+    "se3": (3, False),
+    "sim3": (3, True),
+}
+
+
+class Alignment:
+    """ Struct class for the transform of each system: p -> scale * rotation @ p + translation """
+    def __init__(self, mode: str, rotation: np.ndarray, translation: np.ndarray, scale: np.ndarray):
+        self.mode = mode
+        # (systems, dims, dims)
+        self.rotation = rotation
+        # (systems, dims)
+        self.translation = translation
+        # (systems,), 1 for the se modes
+        self.scale = scale
+
+    def apply(self, positions: np.ndarray) -> np.ndarray:
+        """ The (systems, samples, dims) positions, transformed """
+        rotated = np.einsum("sde,sne->snd", self.rotation, positions)
+        rotated *= self.scale[:, None, None]
+        rotated += self.translation[:, None, :]
+        return rotated
+
+
+def first_poses(valid: np.ndarray, k: int) -> np.ndarray:
+    """ The first k True values of each row of a (systems, samples) mask """
+    return valid & (np.cumsum(valid, axis=1) <= k)
+
+
+def align(positions: np.ndarray, ground_truth: np.ndarray, valid: np.ndarray, mode: str = "se2",
+          first: int | None = None) -> Alignment:
+    """
+    The transform of each row of positions that best matches the same row of ground_truth, over the valid poses
+
+    positions and ground_truth are (systems, samples, dims), valid is (systems, samples). If first is given, only the
+    first that many valid poses of each system are used. Systems with fewer valid poses than dims aren't aligned.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown alignment {mode!r}, expected one of {', '.join(MODES)}")
+    dims, with_scale = MODES[mode]
+    if positions.shape[-1] != dims:
+        raise ValueError(f"{mode} alignment needs {dims}D positions, got {positions.shape[-1]}D")
+
+    used = valid if first is None else first_poses(valid, first)
+    weights = used.astype(float)
+    count = weights.sum(axis=1)
+    enough = count >= dims
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weights /= np.where(count > 0, count, 1)[:, None]
+
+    # The padding and the unused poses are NaN or junk, so they're zeroed rather than just weighted by 0
+    source = np.where(used[..., None], positions, 0.0)
+    target = np.where(used[..., None], ground_truth, 0.0)
+    source_mean = np.einsum("sn,snd->sd", weights, source)
+    target_mean = np.einsum("sn,snd->sd", weights, target)
+    source -= source_mean[:, None, :]
+    target -= target_mean[:, None, :]
+    np.copyto(source, 0.0, where=~used[..., None])
+    np.copyto(target, 0.0, where=~used[..., None])
+
+    # Cross-covariance of every system, and all their SVDs at once
+    covariance = np.einsum("sn,snd,sne->sde", weights, target, source)
+    u, singular, vt = np.linalg.svd(covariance)
+    # Make sure we get a rotation, not a reflection
+    sign = np.sign(np.linalg.det(u) * np.linalg.det(vt))
+    sign[sign == 0] = 1
+    u[:, :, -1] *= sign[:, None]
+    singular[:, -1] *= sign
+    rotation = u @ vt
+
+    if with_scale:
+        variance = np.einsum("sn,snd,snd->s", weights, source, source)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scale = singular.sum(axis=1) / variance
+        scale[~np.isfinite(scale) | (scale <= 0)] = 1.0
+    else:
+        scale = np.ones(len(positions))
+    translation = target_mean - scale[:, None] * np.einsum("sde,se->sd", rotation, source_mean)
+
+    # Leave the systems we couldn't fit where they are
+    rotation[~enough] = np.eye(dims)
+    translation[~enough] = 0.0
+    scale[~enough] = 1.0
+    return Alignment(mode, rotation, translation, scale)
@@ -0,0 +1,147 @@
+# One consolidated archive per dataset directory, with every trajectory in it
+#
+# raw_data/ and damaged_data/ hold one small .npz per system, and the trajectories have different lengths.
+# The archive concatenates all of them into a single contiguous .npy in .build/cache/archives/, next to a .json
+# index with the offset, length and metadata (see systems.py) of each one. A script maps the .npy once and gets
+# every trajectory as a zero-copy slice of it.
+#
+# The index records the mtime, size and sha256 of each .npz, and the archive is rebuilt when any of them change
+# or a file is added or removed.
+
+import hashlib
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+
+from scripts.reusable_code.systems import system_for
+
+ARCHIVE_DIR = ".build/cache/archives"
+
+
+def _sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class TrajectoryArchive:
+    """ Every trajectory in a dataset directory, as slices of one memory-mapped array """
+    def __init__(self, data_dir: str, index: dict, data: np.ndarray):
+        self.data_dir = data_dir
+        # file -> {"offset", "length", "name", "mode", "color"}
+        self.entries: Dict[str, dict] = {entry["file"]: entry for entry in index["trajectories"]}
+        self.data = data
+
+    def files(self) -> List[str]:
+        return list(self.entries)
+
+    def __contains__(self, file: str) -> bool:
+        return file in self.entries
+
+    def __getitem__(self, file: str) -> np.ndarray:
+        """ The trajectory in <data_dir>/<file>.npz, as a read-only view """
+        entry = self.entries[file]
+        return self.data[entry["offset"]:entry["offset"] + entry["length"]]
+
+
+def _index_path(data_dir: str, archive_dir: str) -> str:
+    return os.path.join(archive_dir, f"{os.path.normpath(data_dir).replace(os.sep, '.')}.json")
+
+
+def _sources(data_dir: str) -> List[str]:
+    return sorted(f.removesuffix(".npz") for f in os.listdir(data_dir) if f.endswith(".npz"))
+
+
+def _is_current(data_dir: str, index: dict, archive_dir: str) -> bool:
+    sources = index.get("sources", {})
+    if sorted(sources) != _sources(data_dir) or not os.path.isfile(os.path.join(archive_dir, index["data"])):
+        return False
+    refreshed = False
+    for file, (mtime, size, sha) in sources.items():
+        stat = os.stat(os.path.join(data_dir, f"{file}.npz"))
+        if [stat.st_mtime_ns, stat.st_size] == [mtime, size]:
+            continue
+        # Touched, but maybe not changed
+        if _sha256(os.path.join(data_dir, f"{file}.npz")) != sha:
+            return False
+        sources[file] = [stat.st_mtime_ns, stat.st_size, sha]
+        refreshed = True
+    if refreshed:
+        _write_index(data_dir, index, archive_dir)
+    return True
+
+
+def _write_index(data_dir: str, index: dict, archive_dir: str):
+    path = _index_path(data_dir, archive_dir)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp, path)
+
+
+def build_archive(data_dir: str, archive_dir: str = ARCHIVE_DIR) -> dict:
+    """ Concatenates every .npz in data_dir into one .npy, and returns its index """
+    arrays = []
+    trajectories = []
+    sources = {}
+    offset = 0
+    for file in _sources(data_dir):
+        path = os.path.join(data_dir, f"{file}.npz")
+        stat = os.stat(path)
+        sources[file] = [stat.st_mtime_ns, stat.st_size, _sha256(path)]
+        with np.load(path) as npz:
+            array = npz["data"]
+        if arrays and (array.ndim != arrays[0].ndim or array.shape[1:] != arrays[0].shape[1:]):
+            raise ValueError(f"{path} has shape {array.shape}, but the other trajectories have {arrays[0].shape}")
+        system = system_for(file)
+        trajectories.append({"file": file, "offset": offset, "length": len(array),
+                             "name": system.name, "mode": system.mode, "color": system.color})
+        arrays.append(array)
+        offset += len(array)
+
+    # Name the data after its content, so scripts that already mapped an older archive keep reading a
+    # consistent one while we replace the index
+    digest = hashlib.sha256(json.dumps(sources, sort_keys=True).encode()).hexdigest()[:16]
+    name = f"{os.path.basename(_index_path(data_dir, archive_dir)).removesuffix('.json')}.{digest}.npy"
+    os.makedirs(archive_dir, exist_ok=True)
+    data = np.concatenate(arrays) if arrays else np.empty((0, 2))
+    tmp = os.path.join(archive_dir, f"{name}.{os.getpid()}.tmp.npy")
+    np.save(tmp, data)
+    os.replace(tmp, os.path.join(archive_dir, name))
+
+    previous = _read_index(data_dir, archive_dir)
+    index = {"data": name, "dtype": data.dtype.str, "trajectories": trajectories, "sources": sources}
+    _write_index(data_dir, index, archive_dir)
+    if previous is not None and previous.get("data") not in (None, name):
+        try:
+            os.remove(os.path.join(archive_dir, previous["data"]))
+        except FileNotFoundError:
+            pass
+    return index
+
+
+def _read_index(data_dir: str, archive_dir: str) -> dict | None:
+    try:
+        with open(_index_path(data_dir, archive_dir)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# data_dir -> archive we have already opened in this process
+_opened: Dict[str, TrajectoryArchive] = {}
+
+
+def open_archive(data_dir: str, archive_dir: str = ARCHIVE_DIR) -> TrajectoryArchive:
+    """ The archive for a dataset directory, building it first if it is missing or out of date """
+    data_dir = os.path.normpath(data_dir)
+    if data_dir in _opened:
+        return _opened[data_dir]
+    index = _read_index(data_dir, archive_dir)
+    if index is None or not _is_current(data_dir, index, archive_dir):
+        index = build_archive(data_dir, archive_dir)
+    data = np.load(os.path.join(archive_dir, index["data"]), mmap_mode="r")
+    archive = TrajectoryArchive(data_dir, index, data)
+    _opened[data_dir] = archive
+    return archive
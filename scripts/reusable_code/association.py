@@ -0,0 +1,63 @@
+# Matches the poses of a trajectory with the ground truth by time, instead of by index
+#
+# A SLAM system that drops frames, or runs at a different rate to the GPS, has pose i at a different time to GPS
+# sample i, so comparing them by index measures the wrong error. associate() looks up where the ground truth was
+# at the time of each pose with one np.searchsorted over the whole trajectory, either interpolating between the two
+# ground truth samples around it or taking the nearest one. Poses further than max_offset from any ground truth
+# sample (e.g. after the GPS stopped recording) are left out.
+#
+# Trajectories without timestamps are numbered 0, 1, 2... (see default_timestamps()), which matches them by index
+# like before.
+
+from typing import Tuple
+
+import numpy as np
+
+
+def default_timestamps(length: int) -> np.ndarray:
+    """ Timestamps for a trajectory that doesn't have any: the index of each pose """
+    return np.arange(length, dtype=float)
+
+
+def default_max_offset(gt_t: np.ndarray) -> float:
+    """ Half the usual time between ground truth samples """
+    if len(gt_t) < 2:
+        return 0.0
+    return float(np.median(np.diff(gt_t))) / 2
+
+
+def associate(t: np.ndarray, gt_t: np.ndarray, gt_positions: np.ndarray, max_offset: float | None = None,
+              interpolate: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Where the ground truth was at each time in t
+
+    gt_t has to be sorted, and gt_positions has one row per ground truth sample. Returns the ground truth positions
+    (one row per time in t) and a mask of the times that are within max_offset of a ground truth sample. The
+    positions of the masked out times are still filled in, with the nearest ground truth sample.
+    """
+    t = np.asarray(t, dtype=float)
+    gt_t = np.asarray(gt_t, dtype=float)
+    if max_offset is None:
+        max_offset = default_max_offset(gt_t)
+    if len(gt_t) == 0:
+        return np.full((len(t),) + gt_positions.shape[1:], np.nan), np.zeros(len(t), dtype=bool)
+
+    # The ground truth samples either side of each time, from one binary search
+    left = np.clip(np.searchsorted(gt_t, t, side="right") - 1, 0, max(len(gt_t) - 2, 0))
+    right = np.minimum(left + 1, len(gt_t) - 1)
+    left_t = gt_t[left]
+    right_t = gt_t[right]
+    left_offset = np.abs(t - left_t)
+    right_offset = np.abs(right_t - t)
+    nearest = np.where(left_offset <= right_offset, left, right)
+    valid = np.minimum(left_offset, right_offset) <= max_offset
+
+    if not interpolate or len(gt_t) < 2:
+        return gt_positions[nearest], valid
+
+    # Linear interpolation between the samples either side, clamped to the ends of the ground truth
+    span = right_t - left_t
+    with np.errstate(divide="ignore", invalid="ignore"):
+        w = np.clip(np.where(span > 0, (t - left_t) / span, 0.0), 0.0, 1.0)
+    w = w.reshape((-1,) + (1,) * (gt_positions.ndim - 1))
+    return gt_positions[left] * (1 - w) + gt_positions[right] * w, valid
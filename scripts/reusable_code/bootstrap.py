@@ -0,0 +1,153 @@
+# Confidence intervals for the RMSE and mean ATE of every system, from a block bootstrap
+#
+# One RMSE per system doesn't say how much of the difference between two systems is luck. We resample each system's
+# errors many times and look at the spread of the RMSE. The errors of neighbouring poses are strongly correlated, so
+# instead of single poses we resample blocks of consecutive poses (a moving block bootstrap), block_length(n) poses
+# long, and stitch ceil(n / length) of them together.
+#
+# Every resample of every system is a row of block starts, so a chunk of resamples is one (resamples, systems, blocks)
+# array of random starts. The sum of a block is the difference of two entries of the running sum of the errors, so a
+# resample costs one gather per block instead of one per pose. The chunks are drawn from their own seeds (spawned
+# from the one seed you pass), so the intervals are the same whether they run in this process or on a process pool,
+# which is only started for more than POOL_RESAMPLES resamples.
+#
+#     python3 -m scripts.reusable_code.bootstrap          # prints the intervals of every system of every dataset
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+import numpy as np
+
+from scripts.reusable_code import timing
+from scripts.reusable_code.metrics import BatchMetrics
+
+RESAMPLES = 10_000
+CONFIDENCE = 0.95
+SEED = 0
+
+# Resamples drawn at once, which bounds the memory of the (resamples, systems, blocks) arrays
+CHUNK_RESAMPLES = 250
+# Use a process pool for more resamples than this
+POOL_RESAMPLES = 50_000
+
+
+def block_length(n: int) -> int:
+    """ The usual n^(1/3) block length for n poses """
+    return max(1, int(round(n ** (1 / 3))))
+
+
+class BootstrapInterval:
+    """ Struct class for the bootstrap confidence intervals of every system """
+    def __init__(self, names: List[str], rmse: np.ndarray, mean: np.ndarray, rmse_samples: np.ndarray,
+                 mean_samples: np.ndarray, confidence: float, blocks: np.ndarray, seed: int):
+        self.names = names
+        self.confidence = confidence
+        self.seed = seed
+        # Block length of each system
+        self.blocks = blocks
+        # The RMSE and mean ATE of the valid poses themselves
+        self.rmse = rmse
+        self.mean = mean
+        # (resamples, systems) of each statistic
+        self.rmse_samples = rmse_samples
+        self.mean_samples = mean_samples
+
+        percentiles = 50 * (1 - confidence), 50 * (1 + confidence)
+        self.rmse_low, self.rmse_high = np.percentile(rmse_samples, percentiles, axis=0)
+        self.mean_low, self.mean_high = np.percentile(mean_samples, percentiles, axis=0)
+
+
+def _chunk(seed: np.random.SeedSequence, resamples: int, sums: np.ndarray, last_start: np.ndarray,
+           lengths: np.ndarray) -> np.ndarray:
+    """ The (resamples, 2, systems) bootstrap totals of the squared errors and the errors, for one chunk """
+    rng = np.random.default_rng(seed)
+    systems, blocks = lengths.shape
+    width = sums.shape[2]
+    # A random start for every block of every system of every resample, as an index into the flattened sums
+    starts = rng.random((resamples, systems, blocks))
+    starts *= (last_start + 1)[None, :, None]
+    starts = starts.astype(np.intp)
+    starts += (np.arange(systems) * width)[None, :, None]
+    ends = starts + lengths[None]
+    totals = np.empty((resamples, 2, systems))
+    for j, flat in enumerate(sums.reshape(2, -1)):
+        totals[:, j] = flat[ends].sum(axis=2) - flat[starts].sum(axis=2)
+    return totals
+
+
+def _prepare(metrics: BatchMetrics) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ Running sums of each system's valid squared errors and errors, and the blocks they're resampled in """
+    counts = metrics.count
+    systems = len(counts)
+    width = int(counts.max(initial=0))
+    # (squared errors, errors), (systems, valid poses + 1), with a 0 in front
+    sums = np.zeros((2, systems, width + 1))
+    for i in range(systems):
+        valid = metrics.valid[i]
+        np.cumsum(metrics.sqdist[i, valid], out=sums[0, i, 1:counts[i] + 1])
+        np.cumsum(metrics.dist[i, valid], out=sums[1, i, 1:counts[i] + 1])
+        # So blocks can't run past the end, whatever the padding
+        sums[:, i, counts[i] + 1:] = sums[:, i, counts[i]:counts[i] + 1]
+
+    block = np.array([block_length(n) for n in counts])
+    n_blocks = -(-counts // block)
+    # Every block is a full block, except the last of each system which is cut off at n poses
+    columns = np.arange(max(int(n_blocks.max(initial=0)), 1))
+    lengths = np.where(columns[None, :] < n_blocks[:, None] - 1, block[:, None], 0)
+    lengths[np.arange(systems), np.maximum(n_blocks - 1, 0)] = counts - block * np.maximum(n_blocks - 1, 0)
+    last_start = np.maximum(counts - block, 0)
+    return sums, last_start, lengths
+
+
+def bootstrap(metrics: BatchMetrics, resamples: int = RESAMPLES, confidence: float = CONFIDENCE, seed: int = SEED,
+              workers: int | None = None) -> BootstrapInterval:
+    """ Block bootstrap confidence intervals of the RMSE and mean ATE of every system in metrics """
+    def compute():
+        with timing.phase("bootstrap"):
+            sums, last_start, lengths = _prepare(metrics)
+            sizes = [min(CHUNK_RESAMPLES, resamples - start) for start in range(0, resamples, CHUNK_RESAMPLES)]
+            seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+            args = (sums, last_start, lengths)
+
+            if resamples > POOL_RESAMPLES and (workers is None or workers > 1):
+                with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+                    chunks = list(pool.map(_chunk, seeds, sizes, *([arg] * len(sizes) for arg in args)))
+            else:
+                chunks = [_chunk(chunk_seed, size, *args) for chunk_seed, size in zip(seeds, sizes)]
+            return {"totals": np.concatenate(chunks)}
+
+    # The chunks have their own seeds, so the chunk size changes the resamples too
+    totals = metrics.cached("bootstrap", {"resamples": resamples, "seed": seed, "chunk": CHUNK_RESAMPLES},
+                            compute)["totals"]
+    counts = metrics.count
+    block = np.array([block_length(n) for n in counts])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rmse_samples = np.sqrt(totals[:, 0] / counts)
+        mean_samples = totals[:, 1] / counts
+    return BootstrapInterval(metrics.names, metrics.rmse, metrics.mean, rmse_samples, mean_samples, confidence,
+                             block, seed)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from scripts.reusable_code import metrics as metrics_module
+    from scripts.reusable_code.datasets import DATASETS
+
+    parser = argparse.ArgumentParser(description="Bootstrap confidence intervals of every system's RMSE")
+    parser.add_argument("--resamples", type=int, default=RESAMPLES)
+    parser.add_argument("--confidence", type=float, default=CONFIDENCE)
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+
+    for dataset in DATASETS:
+        dataset.preload()
+        start = time.perf_counter()
+        interval = bootstrap(metrics_module.for_dataset(dataset), args.resamples, args.confidence, args.seed)
+        print(f"{dataset.name} ({args.resamples} resamples, {time.perf_counter() - start:.2f}s), "
+              f"{interval.confidence:.0%} intervals of the RMSE and mean ATE")
+        for i, name in enumerate(interval.names):
+            print(f"  {name:<20}{interval.rmse[i]:7.3f} [{interval.rmse_low[i]:.3f}, {interval.rmse_high[i]:.3f}]"
+                  f"{interval.mean[i]:9.3f} [{interval.mean_low[i]:.3f}, {interval.mean_high[i]:.3f}]")
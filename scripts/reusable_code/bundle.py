@@ -0,0 +1,86 @@
+# Bundles the plots that changed since the last upload to overleaf
+#
+# Instead of deleting ./plots on overleaf and uploading all of it again, ./build.py writes
+# .build/upload/plots-<n>.zip with only the files that were added or changed since the previous bundle, and
+# .build/upload/plots-<n>.json listing them along with the files that were deleted.
+#
+# Plots that didn't really change keep their old file (see export.py), so they aren't bundled again.
+
+import hashlib
+import json
+import os
+import zipfile
+from typing import Dict
+
+from scripts.reusable_code.export import PLOTS_DIR
+
+UPLOAD_DIR = ".build/upload"
+
+
+def _sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def plots_state(plots_dir: str = PLOTS_DIR) -> Dict[str, str]:
+    """ file name -> sha256 of everything in ./plots """
+    if not os.path.isdir(plots_dir):
+        return {}
+    return {
+        name: _sha256(os.path.join(plots_dir, name))
+        for name in sorted(os.listdir(plots_dir))
+        if os.path.isfile(os.path.join(plots_dir, name))
+    }
+
+
+class Bundler:
+    """ Compares ./plots with the last bundle, and bundles the difference """
+    def __init__(self, upload_dir: str = UPLOAD_DIR, plots_dir: str = PLOTS_DIR):
+        self.upload_dir = upload_dir
+        self.plots_dir = plots_dir
+        # The content of ./plots when the last bundle was made
+        self.state_path = os.path.join(upload_dir, "state.json")
+        self.previous: Dict[str, str] = {}
+        self.count = 0
+        if os.path.isfile(self.state_path):
+            try:
+                with open(self.state_path) as f:
+                    data = json.load(f)
+                self.previous = data["files"]
+                self.count = data["count"]
+            except (OSError, ValueError, KeyError):
+                # Without a state the next bundle has every plot in it, like a full upload
+                pass
+
+    def make_bundle(self) -> dict | None:
+        """ Writes a bundle of what changed, and returns its manifest. None if nothing changed """
+        current = plots_state(self.plots_dir)
+        changed = [name for name, sha in current.items() if self.previous.get(name) != sha]
+        deleted = [name for name in self.previous if name not in current]
+        if not changed and not deleted:
+            return None
+
+        self.count += 1
+        name = f"plots-{self.count}"
+        os.makedirs(self.upload_dir, exist_ok=True)
+        zip_path = os.path.join(self.upload_dir, f"{name}.zip")
+        # .pgf is text and compresses well even at the fastest level
+        with zipfile.ZipFile(zip_path + ".tmp", "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+            for file in changed:
+                zf.write(os.path.join(self.plots_dir, file), arcname=file)
+        os.replace(zip_path + ".tmp", zip_path)
+
+        manifest = {
+            "bundle": zip_path,
+            "changed": {file: current[file] for file in changed},
+            "deleted": deleted,
+            "previous": f"plots-{self.count - 1}" if self.count > 1 else None,
+        }
+        with open(os.path.join(self.upload_dir, f"{name}.json"), "w") as f:
+            json.dump(manifest, f, indent=1)
+
+        self.previous = current
+        with open(self.state_path + ".tmp", "w") as f:
+            json.dump({"count": self.count, "files": current}, f, indent=1, sort_keys=True)
+        os.replace(self.state_path + ".tmp", self.state_path)
+        return manifest
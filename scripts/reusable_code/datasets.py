@@ -0,0 +1,115 @@
+# The datasets we have runs for, and where their trajectories are. Add new datasets here!
+#
+# A figure that looks the same for every dataset (like scripts/figures/path.py) is written once, as a
+# render(dataset) function, and render_all() draws it for every dataset here in the same process. So the imports,
+# the matplotlib setup and anything the figures load are shared, and each dataset saves its own
+# <dataset>.<figure>.pgf. Adding a dataset costs one more render, not one more script.
+
+import os
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from scripts.reusable_code.association import default_timestamps
+from scripts.reusable_code.formats import find_run, read_trajectories, read_trajectory
+from scripts.reusable_code.ingest import DEFAULT_COLUMNS
+from scripts.reusable_code.loader import load_timestamps, load_trajectory
+from scripts.reusable_code.systems import BY_FILE, SYSTEMS, System
+
+
+class Dataset:
+    """ Struct class for one set of runs: a directory with one <file>.npz per system """
+    def __init__(self, name: str, data_dir: str, systems: List[str], ground_truth: str = "gps_ground_truth",
+                 max_offset: float | None = None, logs_dir: str | None = None,
+                 log_columns: Tuple[int, int, int] = DEFAULT_COLUMNS, log_time_scale: float = 1.0):
+        # Used to name the plots, e.g. dataset1 -> plots/dataset1.path.pgf
+        self.name = name
+        self.data_dir = data_dir
+        # The systems we have a run of, in the order they appear in legends and tables
+        self.systems: List[System] = [BY_FILE[file] for file in systems]
+        self.ground_truth: System = BY_FILE[ground_truth]
+        # Poses further than this from any ground truth sample (in seconds) are left out of the error.
+        # None means half the time between ground truth samples, see association.py
+        self.max_offset = max_offset
+        # Where the raw logs of the runs are, if they should be converted into data_dir first (see ingest.py).
+        # log_columns are the timestamp, x and y columns, and log_time_scale converts the timestamps to seconds
+        self.logs_dir = logs_dir
+        self.log_columns = log_columns
+        self.log_time_scale = log_time_scale
+
+    def path(self, system: System) -> str:
+        """ The system's <file>.npz, or else the TUM, KITTI or EuRoC file it wrote itself (see formats.py) """
+        npz = os.path.join(self.data_dir, f"{system.file}.npz")
+        if os.path.isfile(npz):
+            return npz
+        return find_run(self.data_dir, system.file) or npz
+
+    def load(self, system: System) -> np.ndarray:
+        """ The N x 2 trajectory of one system in this dataset """
+        path = self.path(system)
+        if not path.endswith(".npz"):
+            return read_trajectory(path).xy()
+        return load_trajectory(path)
+
+    def load_timestamps(self, system: System) -> np.ndarray:
+        """ The time of each pose of a system. Runs without timestamps get 0, 1, 2... """
+        path = self.path(system)
+        if not path.endswith(".npz"):
+            return read_trajectory(path).timestamps
+        timestamps = load_timestamps(path)
+        return timestamps if timestamps is not None else default_timestamps(len(self.load(system)))
+
+    def preload(self):
+        """ Reads all the runs that aren't .npz files at once, instead of one by one as the figure needs them """
+        paths = [self.path(system) for system in [self.ground_truth] + self.systems]
+        read_trajectories([path for path in paths if not path.endswith(".npz")])
+
+    def load_ground_truth(self) -> np.ndarray:
+        return self.load(self.ground_truth)
+
+    def with_mode(self, mode: str) -> List[System]:
+        """ The systems that use a sensor, e.g. "Lidar" """
+        return [system for system in self.systems if system.mode == mode]
+
+
+# Every system except the GPS, which is the ground truth
+SLAM_SYSTEMS = [system.file for system in SYSTEMS if system.mode != "GPS"]
+
+DATASETS: List[Dataset] = [
+    Dataset("dataset1", "raw_data", SLAM_SYSTEMS),
+    # The same runs, after the recordings were truncated
+    Dataset("damaged", "damaged_data", SLAM_SYSTEMS),
+]
+
+BY_NAME: Dict[str, Dataset] = {dataset.name: dataset for dataset in DATASETS}
+
+# Where manifest.py and watch.py look for input data
+DATA_DIRS: List[str] = sorted({dataset.data_dir for dataset in DATASETS})
+
+
+def figure_filename(dataset: Dataset, script_file: str) -> str:
+    """ scripts/figures/path.py for dataset1 -> dataset1.path """
+    return f"{dataset.name}.{os.path.basename(script_file).removesuffix('.py')}"
+
+
+def render_all(render: Callable[[Dataset], Any], script_file: str, interactive: bool = False,
+               datasets: List[Dataset] | None = None):
+    """ Draws render(dataset) for every dataset, and saves each one named after the dataset and the script """
+    # Only scripts that draw something need matplotlib, not everything that wants to know about the datasets
+    import matplotlib.pyplot as plt
+    from scripts.reusable_code import export, integrity, timing
+
+    for dataset in datasets or DATASETS:
+        dataset.preload()
+        # Stop before the slow part if the inputs are broken
+        with timing.phase("integrity"):
+            integrity.scan(dataset).check()
+        with timing.phase(f"render {dataset.name}"):
+            fig = render(dataset)
+        if interactive:
+            plt.show()
+        else:
+            # Save PGF for LaTeX, and any previews build.py asked for
+            export.save(fig, script_file, filename=figure_filename(dataset, script_file))
+        # Done with it, don't keep every dataset's figure around
+        plt.close(fig)
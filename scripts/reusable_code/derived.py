@@ -0,0 +1,143 @@
+# A cache of the arrays we work out from the trajectories (errors, RMSE curves, RPE...), keyed by what they came from
+#
+# path.py, lidar.py and rmse.py all compute the same errors of the same runs, on every build, even when no .npz
+# changed. Instead, metrics.py asks this cache first. An entry's key is the sha256 of the input arrays (their dtype,
+# shape and bytes) and the parameters of the metric, so it doesn't matter which script or file the arrays came from,
+# and any change to them (or to the parameters) is a different entry. The key also covers the source of the modules
+# that compute the cached arrays (CODE), so fixing a bug in metrics.py or rpe.py doesn't leave the old numbers in the
+# cache for build.py to keep plotting.
+#
+# Each entry is a directory in .build/cache/derived/ with one uncompressed .npy per array, written to a temporary
+# directory and renamed into place, so other scripts never see half an entry. A hit memory-maps the arrays
+# read-only, so a warm run doesn't compute or even read them until they're used.
+#
+# The cache is kept under MAX_BYTES by deleting the least recently used entries (by the mtime of their index.json,
+# which every hit touches) after each write.
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Callable, Dict, Iterable
+
+import numpy as np
+
+from scripts.reusable_code import timing
+
+CACHE_DIR = ".build/cache/derived"
+MAX_BYTES = 512 * 1024 * 1024
+
+# The modules whose code decides what's in the cache. An edit to any of them is a new key for every entry
+CODE = ("derived.py", "metrics.py", "association.py", "alignment.py", "rpe.py", "bootstrap.py")
+
+# The sha256 of the CODE files, worked out once per process
+_code_digest: str | None = None
+
+
+def code_digest() -> str:
+    """ The sha256 of the source of every module in CODE """
+    global _code_digest
+    if _code_digest is None:
+        h = hashlib.sha256()
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for module in CODE:
+            h.update(module.encode())
+            with open(os.path.join(directory, module), "rb") as f:
+                h.update(hashlib.sha256(f.read()).digest())
+        _code_digest = h.hexdigest()
+    return _code_digest
+
+
+def digest(arrays: Iterable[np.ndarray], params: dict | None = None) -> str:
+    """ The sha256 of some arrays (and their dtypes and shapes) and the parameters computed from them """
+    h = hashlib.sha256()
+    h.update(json.dumps({"code": code_digest(), "params": params or {}}, sort_keys=True, default=str).encode())
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        h.update(f"{array.dtype.str}{array.shape}".encode())
+        h.update(array.reshape(-1).view(np.uint8))
+    return h.hexdigest()
+
+
+def load(key: str, cache_dir: str = CACHE_DIR) -> Dict[str, np.ndarray] | None:
+    """ The arrays stored under key, memory-mapped, or None if there aren't any """
+    entry = os.path.join(cache_dir, key)
+    index_path = os.path.join(entry, "index.json")
+    try:
+        with open(index_path) as f:
+            names = json.load(f)["arrays"]
+        arrays = {}
+        for name in names:
+            path = os.path.join(entry, f"{name}.npy")
+            try:
+                arrays[name] = np.load(path, mmap_mode="r")
+            except ValueError:
+                # Empty arrays can't be memory-mapped
+                arrays[name] = np.load(path)
+        # The entry was just used
+        os.utime(index_path)
+    except (OSError, ValueError, KeyError):
+        return None
+    return arrays
+
+
+def _entries(cache_dir: str):
+    """ (last used, size, path) of every finished entry """
+    entries = []
+    for key in os.listdir(cache_dir):
+        if key.endswith(".tmp"):
+            # Another script is still writing it (see store())
+            continue
+        entry = os.path.join(cache_dir, key)
+        try:
+            used = os.stat(os.path.join(entry, "index.json")).st_mtime_ns
+            size = sum(os.path.getsize(os.path.join(entry, file)) for file in os.listdir(entry))
+        except OSError:
+            # Half written, or deleted under us
+            continue
+        entries.append((used, size, entry))
+    return entries
+
+
+def evict(cache_dir: str = CACHE_DIR, max_bytes: int = MAX_BYTES, keep: str | None = None):
+    """ Deletes the least recently used entries until the cache fits in max_bytes """
+    entries = sorted(_entries(cache_dir))
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in entries:
+        if total <= max_bytes:
+            break
+        if os.path.basename(entry) == keep:
+            continue
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+
+
+def store(key: str, arrays: Dict[str, np.ndarray], cache_dir: str = CACHE_DIR, max_bytes: int = MAX_BYTES):
+    """ Saves arrays under key, unless another script already has """
+    entry = os.path.join(cache_dir, key)
+    if os.path.isdir(entry):
+        return
+    tmp = f"{entry}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(tmp, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), np.asarray(array))
+        with open(os.path.join(tmp, "index.json"), "w") as f:
+            json.dump({"arrays": list(arrays)}, f)
+        os.rename(tmp, entry)
+    except OSError:
+        # Another script got there first, or we can't write the cache (e.g. a read-only checkout)
+        shutil.rmtree(tmp, ignore_errors=True)
+        return
+    evict(cache_dir, max_bytes, keep=key)
+
+
+def cached(key: str, compute: Callable[[], Dict[str, np.ndarray]],
+           cache_dir: str = CACHE_DIR) -> Dict[str, np.ndarray]:
+    """ The arrays stored under key, or else compute() (which is then stored) """
+    arrays = load(key, cache_dir)
+    if arrays is None:
+        arrays = compute()
+        with timing.phase("derived cache store"):
+            store(key, arrays, cache_dir)
+    return arrays
@@ -0,0 +1,165 @@
+# Saves a finished figure as .pgf for LaTeX, plus any other formats we want for review
+#
+# ./build.py --formats pgf,pdf,png sets PLOT_FORMATS. The .pgf goes to plots/ like always, and the other formats go
+# to previews/ so they don't end up on overleaf.
+#
+# The figure is only built once. The .pgf is saved first, in this process, which lays the figure out and measures
+# all of its text. Then every other format is saved at the same time, each in a forked copy of this process, so
+# adding a format costs about one savefig instead of a whole extra run of the script.
+#
+# Each file is saved to a temporary directory first, and only replaces the old one if the content changed,
+# ignoring details that change on every save (comments, creation dates, the matplotlib version). So a plot that
+# didn't really change keeps its old file and mtime, and bundle.py knows not to upload it again.
+
+import os
+import re
+import sys
+import tempfile
+from contextlib import nullcontext
+from typing import List
+
+from scripts.reusable_code import timing
+
+FORMATS_ENV = "PLOT_FORMATS"
+PLOTS_DIR = "plots"
+PREVIEW_DIR = "previews"
+TMP_DIR = ".build/export"
+
+# The backend to save each format with. pdf goes through LaTeX so it looks exactly like the thesis
+BACKENDS = {
+    "pgf": "pgf",
+    "pdf": "pgf",
+    "png": "agg",
+    "svg": "svg",
+}
+
+# Leave out the metadata that changes between saves, so identical plots give identical files
+METADATA = {
+    "pdf": {"CreationDate": None, "ModDate": None, "Producer": None, "Creator": None},
+    "png": {"Software": None},
+    "svg": {"Date": None, "Creator": None},
+}
+
+# The svg clip path ids are random unless they are salted
+RCPARAMS = {
+    "svg": {"svg.hashsalt": "plots"},
+}
+
+# What to ignore when comparing a new file with the old one
+VOLATILE = {
+    # "%% Creator: Matplotlib, PGF backend" and the preamble it was made with
+    "pgf": re.compile(rb"^%%.*$\n?", re.MULTILINE),
+    # pdflatex adds its own dates and a random file ID
+    "pdf": re.compile(rb"/(CreationDate|ModDate) *\([^)]*\)|/ID *\[[^]]*\]"),
+    "svg": re.compile(rb"<dc:date>.*?</dc:date>|<!-- Created with .*? -->"),
+}
+
+
+def plot_filename(script_file: str) -> str:
+    """ The name of the plot, based on the name of the python file. scripts/dataset1/bars2.py -> dataset1.bars2 """
+    # Absolute path of the current file
+    current_script_file = os.path.abspath(script_file)
+    # Relative path from the current working directory
+    relative_path = os.path.relpath(current_script_file, start=os.getcwd())
+    return relative_path.removesuffix('.py').removeprefix('scripts/').replace('/', '.')
+
+
+def requested_formats() -> List[str]:
+    formats = [f.strip() for f in os.environ.get(FORMATS_ENV, "pgf").split(",") if f.strip()]
+    # We always need the .pgf
+    return ["pgf"] + [f for f in formats if f != "pgf"]
+
+
+def output_path(filename: str, fmt: str) -> str:
+    return os.path.join(PLOTS_DIR if fmt == "pgf" else PREVIEW_DIR, f"{filename}.{fmt}")
+
+
+def normalised(data: bytes, fmt: str) -> bytes:
+    pattern = VOLATILE.get(fmt)
+    return pattern.sub(b"", data) if pattern is not None else data
+
+
+def same_content(a: str, b: str, fmt: str) -> bool:
+    try:
+        if os.path.getsize(a) != os.path.getsize(b) and fmt not in VOLATILE:
+            return False
+        with open(a, "rb") as fa, open(b, "rb") as fb:
+            return normalised(fa.read(), fmt) == normalised(fb.read(), fmt)
+    except FileNotFoundError:
+        return False
+
+
+def replace_if_changed(new: str, path: str) -> bool:
+    """ Moves new to path, unless path already has the same content. Returns True if path changed """
+    fmt = os.path.splitext(path)[1].removeprefix(".")
+    if same_content(new, path, fmt):
+        os.remove(new)
+        return False
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    os.replace(new, path)
+    return True
+
+
+def _save_file(fig, path: str, fmt: str) -> List[str]:
+    """ Saves the figure to path, only touching files that changed. Returns every file it saved """
+    # Only needed once there's a figure, so importing export.py stays cheap
+    import matplotlib
+
+    os.makedirs(TMP_DIR, exist_ok=True)
+    # The pgf backend writes rasterised parts next to the .pgf, named after it, so keep the real file name
+    # The pgf format doesn't take metadata at all
+    kwargs = {"metadata": METADATA[fmt]} if fmt in METADATA else {}
+    with tempfile.TemporaryDirectory(dir=TMP_DIR) as tmp, matplotlib.rc_context(RCPARAMS.get(fmt, {})):
+        fig.savefig(os.path.join(tmp, os.path.basename(path)), backend=BACKENDS.get(fmt), **kwargs)
+        saved = []
+        for name in sorted(os.listdir(tmp)):
+            output = os.path.join(os.path.dirname(path), name)
+            replace_if_changed(os.path.join(tmp, name), output)
+            saved.append(output)
+        return saved
+
+
+def save(fig, script_file: str, formats: List[str] | None = None, filename: str | None = None):
+    """ Saves the figure in every requested format, named after the script that made it (or filename) """
+    filename = filename or plot_filename(script_file)
+    formats = formats or requested_formats()
+
+    # Save PGF for LaTeX
+    pgf_path = output_path(filename, "pgf")
+    with timing.phase("savefig"):
+        for path in _save_file(fig, pgf_path, "pgf"):
+            timing.record_output(path)
+
+    # Everything else at once, from copies of this process
+    children = {}
+    extra = [fmt for fmt in formats if fmt != "pgf"]
+    for fmt in extra:
+        path = output_path(filename, fmt)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                # Makes pdflatex leave out the date too
+                os.environ["SOURCE_DATE_EPOCH"] = "0"
+                os.environ["FORCE_SOURCE_DATE"] = "1"
+                _save_file(fig, path, fmt)
+            except BaseException as e:
+                print(f"Couldn't save {path}: {e!r}", file=sys.stderr)
+                code = 1
+            sys.stdout.flush()
+            sys.stderr.flush()
+            # Skip atexit and finalizers, they belong to the parent. In particular, matplotlib's finalizer for
+            # its LaTeX process would kill the parent's LaTeX
+            os._exit(code)
+        children[pid] = path
+
+    with timing.phase(f"savefig {','.join(extra)}") if children else nullcontext():
+        for pid, path in children.items():
+            _, status = os.waitpid(pid, 0)
+            if os.waitstatus_to_exitcode(status) == 0:
+                timing.record_output(path)
+            else:
+                raise RuntimeError(f"Failed to save {path}")
+
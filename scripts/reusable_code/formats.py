@@ -0,0 +1,184 @@
+# Reads the trajectory files the SLAM systems write themselves, so a dataset directory can hold real runs
+#
+#  - TUM ("timestamp tx ty tz qx qy qz qw", space separated): ORB-SLAM3, DROID-SLAM, MASt3R-SLAM, RTAB-Map
+#  - KITTI (a 3 x 4 pose matrix per line, row-major, no timestamps): ORB-SLAM3 stereo, most odometry benchmarks
+#  - EuRoC ("#timestamp [ns],p_x,p_y,p_z,q_w,q_x,q_y,q_z...", comma separated): the EuRoC ground truth, and what
+#    some systems write for it
+#
+# Each file is parsed with one np.loadtxt call for the columns we need, and read_trajectories() reads a dataset's
+# files on a thread pool. The result (timestamps and x, y, z) is cached as an uncompressed .npy in
+# .build/cache/formats/, checked against the file's mtime and size (then its sha256) like loader.py does, so the
+# text is only parsed again when it changes. Every later read memory-maps the cache.
+#
+# The plots only use a plane of the trajectory: x, y for TUM and EuRoC, and x, z for KITTI, whose camera frame has
+# y pointing down.
+
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+from scripts.reusable_code import timing
+from scripts.reusable_code.association import default_timestamps
+
+CACHE_DIR = ".build/cache/formats"
+
+# Extensions we look for next to (or instead of) the .npz of a system, and the format they usually hold.
+# .txt could be TUM or KITTI, so we look at the number of columns
+EXTENSIONS = {".tum": "tum", ".kitti": "kitti", ".csv": "euroc", ".txt": None}
+
+# format -> (timestamp column or None, x, y, z columns, what to multiply the timestamps by to get seconds)
+COLUMNS = {
+    "tum": (0, (1, 2, 3), 1.0),
+    "kitti": (None, (3, 7, 11), 1.0),
+    "euroc": (0, (1, 2, 3), 1e-9),
+}
+
+# The axes of the plane the plots draw, per format
+PLANES = {"tum": (0, 1), "euroc": (0, 1), "kitti": (0, 2)}
+
+# Columns in a line of each format
+WIDTHS = {8: "tum", 12: "kitti"}
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _first_line(path: str) -> str:
+    with open(path) as f:
+        for line in f:
+            if line.strip() and not line.lstrip().startswith("#"):
+                return line
+    return ""
+
+
+def detect_format(path: str) -> str:
+    """ "tum", "kitti" or "euroc", from the extension or else the first line of the file """
+    fmt = EXTENSIONS.get(os.path.splitext(path)[1])
+    if fmt is not None:
+        return fmt
+    line = _first_line(path)
+    if "," in line:
+        return "euroc"
+    width = len(line.split())
+    if width not in WIDTHS:
+        raise ValueError(f"{path} has {width} columns, which isn't TUM (8) or KITTI (12)")
+    return WIDTHS[width]
+
+
+def parse(path: str, fmt: str) -> np.ndarray:
+    """ The N x 4 array of timestamp (seconds), x, y, z in a trajectory file """
+    time_column, xyz, time_scale = COLUMNS[fmt]
+    columns = ((time_column,) if time_column is not None else ()) + xyz
+    table = np.loadtxt(path, comments="#", delimiter="," if fmt == "euroc" else None, usecols=columns,
+                       dtype=np.float64, ndmin=2)
+    parsed = np.empty((len(table), 4))
+    if time_column is None:
+        parsed[:, 0] = default_timestamps(len(table))
+        parsed[:, 1:] = table
+    else:
+        parsed[:, 0] = table[:, 0] * time_scale
+        parsed[:, 1:] = table[:, 1:]
+    return parsed
+
+
+def _write_json(path: str, data: dict):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def cached_parse(path: str, fmt: str, cache_dir: str = CACHE_DIR) -> np.ndarray:
+    """ parse(path, fmt), from the cache if the file hasn't changed since we last parsed it """
+    name = os.path.normpath(path).replace(os.sep, ".")
+    npy_path = os.path.join(cache_dir, f"{name}.npy")
+    info_path = os.path.join(cache_dir, f"{name}.json")
+    stat = os.stat(path)
+    try:
+        with open(info_path) as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        info = {}
+
+    if info.get("format") == fmt and os.path.isfile(npy_path):
+        if [info.get("mtime"), info.get("size")] == [stat.st_mtime_ns, stat.st_size]:
+            return np.load(npy_path, mmap_mode="r")
+        sha = _sha256(path)
+        if info.get("sha256") == sha:
+            # Touched but not changed
+            _write_json(info_path, info | {"mtime": stat.st_mtime_ns, "size": stat.st_size})
+            return np.load(npy_path, mmap_mode="r")
+    else:
+        sha = _sha256(path)
+
+    parsed = parse(path, fmt)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # np.save adds .npy unless the name already ends with it
+        tmp = f"{npy_path}.{os.getpid()}.tmp.npy"
+        np.save(tmp, parsed)
+        os.replace(tmp, npy_path)
+        _write_json(info_path, {"format": fmt, "mtime": stat.st_mtime_ns, "size": stat.st_size, "sha256": sha})
+    except OSError:
+        # We can't write the cache (e.g. a read-only checkout), it just won't be faster next time
+        pass
+    parsed.flags.writeable = False
+    return parsed
+
+
+class Trajectory:
+    """ Struct class for a trajectory read from a TUM, KITTI or EuRoC file """
+    def __init__(self, path: str, fmt: str, table: np.ndarray):
+        self.path = path
+        self.format = fmt
+        # The time of each pose, in seconds. KITTI files don't have any, so their poses are numbered 0, 1, 2...
+        self.timestamps = table[:, 0]
+        # N x 3 x, y, z
+        self.positions = table[:, 1:]
+
+    def xy(self) -> np.ndarray:
+        """ The N x 2 positions in the plane the plots draw, like the "data" array of a .npz """
+        return self.positions[:, PLANES[self.format]]
+
+
+# path -> trajectory we have already read in this process
+_read: Dict[str, Trajectory] = {}
+
+
+def read_trajectory(path: str, fmt: str | None = None) -> Trajectory:
+    """ A trajectory file, read at most once per process """
+    path = os.path.normpath(path)
+    if path not in _read:
+        fmt = fmt or detect_format(path)
+        with timing.phase(f"read {fmt}"):
+            _read[path] = Trajectory(path, fmt, cached_parse(path, fmt))
+    return _read[path]
+
+
+def read_trajectories(paths: List[str], workers: int | None = None) -> List[Trajectory]:
+    """ Several trajectory files, read at the same time """
+    todo = sorted({path for path in map(os.path.normpath, paths) if path not in _read})
+    if len(todo) > 1:
+        with ThreadPoolExecutor(max_workers=workers or min(len(todo), os.cpu_count() or 1)) as pool:
+            # Each thread fills in _read, we only need to wait for them
+            list(pool.map(read_trajectory, todo))
+    return [read_trajectory(path) for path in paths]
+
+
+def find_run(data_dir: str, file: str) -> str | None:
+    """ The trajectory file for a system in a dataset directory, e.g. raw_data/orb_slam3_traj.txt, if there is one """
+    for extension in EXTENSIONS:
+        path = os.path.join(data_dir, file + extension)
+        if os.path.isfile(path):
+            return path
+    return None
+
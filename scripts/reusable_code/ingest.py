@@ -0,0 +1,217 @@
+# Converts raw SLAM trajectory logs (multi-gigabyte CSV or whitespace separated text) into the .npz files the plots load
+#
+# The log is read in chunks of CHUNK_BYTES, cut at the last full line, and each chunk is parsed in one np.loadtxt
+# call and appended to a flat binary file in .build/ingest/. Once the whole log is read, the .npz is written from a
+# memory map of that file, which numpy copies in buffered blocks too. So memory use depends on CHUNK_BYTES, not on
+# the size of the log.
+#
+# The .npz gets the usual N x 2 "data" array of x, y positions, plus the "timestamps" of each pose (see
+# association.py). We remember the mtime, size and sha256 of every log in .build/ingest.json, and only ingest it
+# again when its content (or the options we ingest it with) changes. The sha256 is computed while the log is read,
+# so ingesting doesn't read the file twice.
+#
+# Datasets with a logs_dir (see datasets.py) are ingested by ./build.py before it runs any script. To ingest a
+# single log by hand:
+#
+#     python3 -m scripts.reusable_code.ingest my_run.csv raw_data/my_system_traj.npz --columns 0,1,2
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import warnings
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+INGEST_STATE_PATH = ".build/ingest.json"
+INGEST_DIR = ".build/ingest"
+CHUNK_BYTES = 64 * 1024 * 1024
+
+# The columns of the timestamp, x and y in a log. The TUM format is "timestamp tx ty tz qx qy qz qw"
+DEFAULT_COLUMNS = (0, 1, 2)
+
+# The extensions of the logs we look for in a dataset's logs_dir
+LOG_EXTENSIONS = (".csv", ".txt", ".tum", ".log")
+
+
+def _read_state(path: str = INGEST_STATE_PATH) -> Dict[str, dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_state(state: Dict[str, dict], path: str = INGEST_STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_chunks(path: str, chunk_bytes: int = CHUNK_BYTES, digest=None) -> Iterator[bytes]:
+    """ The file in blocks of about chunk_bytes, each ending at the end of a line. Feeds digest along the way """
+    rest = b""
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(chunk_bytes)
+            if digest is not None:
+                digest.update(block)
+            if not block:
+                break
+            end = block.rfind(b"\n")
+            if end < 0:
+                # A line longer than a whole chunk, keep reading
+                rest += block
+                continue
+            yield rest + block[:end + 1]
+            rest = block[end + 1:]
+    if rest.strip():
+        yield rest
+
+
+def _is_header(line: bytes, delimiter: str | None) -> bool:
+    """ True for a column header like "t,x,y", which isn't a comment but isn't numbers either """
+    fields = line.split(delimiter.encode() if delimiter else None)
+    try:
+        float(fields[0])
+        return False
+    except (ValueError, IndexError):
+        return True
+
+
+def parse_chunk(chunk: bytes, columns: Tuple[int, int, int], delimiter: str | None) -> np.ndarray:
+    """ The timestamp, x and y columns of every line in a chunk of a log, as a rows x 3 array """
+    with warnings.catch_warnings():
+        # A chunk can be nothing but comments
+        warnings.simplefilter("ignore", UserWarning)
+        rows = np.loadtxt(io.StringIO(chunk.decode()), delimiter=delimiter, comments="#", usecols=columns,
+                          dtype=np.float64, ndmin=2)
+    return rows.reshape(-1, 3)
+
+
+def _sniff(path: str) -> Tuple[str | None, int]:
+    """ The delimiter of a log (None for whitespace), and how many header lines to skip """
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.strip() or line.lstrip().startswith(b"#"):
+                continue
+            delimiter = "," if b"," in line else None
+            return delimiter, int(_is_header(line, delimiter))
+    return None, 0
+
+
+def ingest(source: str, target: str, columns: Tuple[int, int, int] = DEFAULT_COLUMNS, time_scale: float = 1.0,
+           chunk_bytes: int = CHUNK_BYTES, force: bool = False, state_path: str = INGEST_STATE_PATH) -> bool:
+    """
+    Converts the log at source into the .npz at target, unless it already has been. Returns True if it did
+
+    columns are the timestamp, x and y columns of the log, and time_scale converts its timestamps to seconds
+    (e.g. 1e-9 for EuRoC's nanoseconds).
+    """
+    options = {"columns": list(columns), "time_scale": time_scale}
+    state = _read_state(state_path)
+    known = state.get(target)
+    stat = os.stat(source)
+    if not force and known is not None and known["source"] == source and known["options"] == options \
+            and os.path.isfile(target):
+        if [known["mtime"], known["size"]] == [stat.st_mtime_ns, stat.st_size]:
+            return False
+        # Touched, but maybe not changed
+        if known["sha256"] == _sha256(source):
+            state[target] |= {"mtime": stat.st_mtime_ns, "size": stat.st_size}
+            _write_state(state, state_path)
+            return False
+
+    delimiter, skip = _sniff(source)
+    os.makedirs(INGEST_DIR, exist_ok=True)
+    rows_path = os.path.join(INGEST_DIR, f"{os.path.basename(target)}.{os.getpid()}.rows")
+    digest = hashlib.sha256()
+    rows = 0
+    try:
+        with open(rows_path, "wb") as out:
+            for chunk in read_chunks(source, chunk_bytes, digest):
+                if skip:
+                    # The header is the first line that isn't a comment
+                    lines = chunk.split(b"\n")
+                    for i, line in enumerate(lines):
+                        if line.strip() and not line.lstrip().startswith(b"#"):
+                            del lines[i]
+                            skip = 0
+                            break
+                    chunk = b"\n".join(lines)
+                parsed = parse_chunk(chunk, columns, delimiter)
+                if time_scale != 1.0:
+                    parsed[:, 0] *= time_scale
+                out.write(parsed.tobytes())
+                rows += len(parsed)
+
+        table = np.memmap(rows_path, dtype=np.float64, mode="r", shape=(rows, 3)) if rows \
+            else np.empty((0, 3))
+        # np.savez adds .npz unless the name already ends with it
+        tmp = f"{target}.{os.getpid()}.tmp.npz"
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        # The columns aren't contiguous, so numpy writes them a buffer at a time instead of copying them first
+        np.savez(tmp, data=table[:, 1:3], timestamps=table[:, 0])
+        os.replace(tmp, target)
+        del table
+    finally:
+        if os.path.exists(rows_path):
+            os.remove(rows_path)
+
+    state = _read_state(state_path)
+    state[target] = {"source": source, "options": options, "mtime": stat.st_mtime_ns, "size": stat.st_size,
+                     "sha256": digest.hexdigest(), "rows": rows}
+    _write_state(state, state_path)
+    return True
+
+
+def logs_in(logs_dir: str) -> List[str]:
+    """ The logs in a directory, e.g. rtabmap_slam_traj.csv """
+    return sorted(f for f in os.listdir(logs_dir) if f.endswith(LOG_EXTENSIONS))
+
+
+def ingest_dataset(dataset, force: bool = False) -> List[str]:
+    """ Ingests every log in the dataset's logs_dir into its data_dir, and returns the .npz files that changed """
+    if dataset.logs_dir is None or not os.path.isdir(dataset.logs_dir):
+        return []
+    changed = []
+    for log in logs_in(dataset.logs_dir):
+        target = os.path.join(dataset.data_dir, f"{os.path.splitext(log)[0]}.npz")
+        if ingest(os.path.join(dataset.logs_dir, log), target, dataset.log_columns, dataset.log_time_scale,
+                  force=force):
+            changed.append(target)
+    return changed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a trajectory log into a .npz for the plots")
+    parser.add_argument("source", help="the CSV or whitespace separated log")
+    parser.add_argument("target", help="the .npz to write, e.g. raw_data/rtabmap_slam_traj.npz")
+    parser.add_argument("--columns", default=",".join(map(str, DEFAULT_COLUMNS)),
+                        help="the timestamp, x and y columns of the log (default: 0,1,2)")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="multiply the timestamps by this to get seconds (default: 1)")
+    parser.add_argument("--chunk-mib", type=int, default=CHUNK_BYTES // (1024 * 1024),
+                        help="how much of the log to parse at once")
+    parser.add_argument("--force", action="store_true", help="ingest the log even if it hasn't changed")
+    args = parser.parse_args()
+
+    columns = tuple(int(c) for c in args.columns.split(","))
+    if len(columns) != 3:
+        parser.error("--columns takes the timestamp, x and y columns")
+    if ingest(args.source, args.target, columns, args.time_scale, args.chunk_mib * 1024 * 1024, args.force):
+        print(f"Ingested {args.source} into {args.target}")
+    else:
+        print(f"{args.target} is up to date")
@@ -0,0 +1,188 @@
+# Checks a dataset's trajectories before we spend a LaTeX render on them
+#
+# damaged_data/ showed that runs can be truncated or corrupted, and we'd only notice when a figure looked wrong.
+# scan() concatenates the ground truth and every trajectory of a dataset (like archive.py does) and checks all of
+# them in one vectorised pass over the concatenated arrays, flagging each pose that:
+#
+#  - has a NaN or inf position or timestamp (error)
+#  - has a timestamp before the previous pose's (error)
+#  - has the same timestamp as the previous pose (warning)
+#  - is further from the previous pose than JUMP_FACTOR times the trajectory's median step, i.e. teleported (warning)
+#  - has no ground truth sample within the dataset's max_offset (warning, see association.py)
+#
+# It also warns about trajectories that cover much less of the run than the ground truth does.
+#
+# The flags are kept as one byte per pose, so the metric code can leave the bad poses out with
+# report.usable(system), and render_all() (datasets.py) stops before drawing anything if a dataset has errors.
+#
+#     python3 -m scripts.reusable_code.integrity       # prints the report of every dataset
+
+import sys
+from typing import Dict, List
+
+import numpy as np
+
+from scripts.reusable_code.association import associate
+
+NON_FINITE = 1
+BACKWARDS = 2
+DUPLICATE = 4
+JUMP = 8
+UNMATCHED = 16
+
+FLAG_NAMES = {
+    NON_FINITE: "NaN/inf values",
+    BACKWARDS: "timestamps going backwards",
+    DUPLICATE: "duplicate timestamps",
+    JUMP: "jumps",
+    UNMATCHED: "poses without ground truth",
+}
+
+# Flags that make a dataset fail the check
+ERRORS = NON_FINITE | BACKWARDS
+# Flags that leave a pose out of the metrics
+UNUSABLE = NON_FINITE | BACKWARDS | DUPLICATE
+
+# A step this many times the median step of the trajectory is a jump
+JUMP_FACTOR = 20
+# Warn about trajectories that cover less than this much of the ground truth's time span
+MIN_COVERAGE = 0.9
+
+
+class IntegrityReport:
+    """ What scan() found, with one byte of flags per pose """
+    def __init__(self, name: str, files: List[str], lengths: np.ndarray, flags: np.ndarray, coverage: np.ndarray):
+        self.name = name
+        # The ground truth first, then every system
+        self.files = files
+        self.lengths = lengths
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(int)
+        self.flags = flags
+        # The fraction of the ground truth's time span each trajectory covers
+        self.coverage = coverage
+        self.index: Dict[str, int] = {file: i for i, file in enumerate(files)}
+
+    def flags_of(self, file: str) -> np.ndarray:
+        i = self.index[file]
+        return self.flags[self.offsets[i]:self.offsets[i] + self.lengths[i]]
+
+    def usable(self, file: str) -> np.ndarray:
+        """ Mask of the poses of a trajectory the metrics should use """
+        return (self.flags_of(file) & UNUSABLE) == 0
+
+    def counts(self) -> Dict[str, Dict[int, int]]:
+        """ file -> flag -> number of poses with it """
+        segment = np.repeat(np.arange(len(self.files)), self.lengths)
+        per_flag = {flag: np.bincount(segment, weights=(self.flags & flag) != 0, minlength=len(self.files))
+                    for flag in FLAG_NAMES}
+        return {file: {flag: int(per_flag[flag][i]) for flag in FLAG_NAMES if per_flag[flag][i]}
+                for i, file in enumerate(self.files)}
+
+    def problems(self, errors: bool) -> List[str]:
+        lines = []
+        for file, counts in self.counts().items():
+            for flag, count in counts.items():
+                if bool(flag & ERRORS) == errors:
+                    lines.append(f"{self.name}/{file}: {count} {FLAG_NAMES[flag]}")
+        if not errors:
+            for file, coverage in zip(self.files[1:], self.coverage[1:]):
+                if coverage < MIN_COVERAGE:
+                    lines.append(f"{self.name}/{file}: only covers {coverage:.0%} of the ground truth")
+        return lines
+
+    def errors(self) -> List[str]:
+        return self.problems(errors=True)
+
+    def warnings(self) -> List[str]:
+        return self.problems(errors=False)
+
+    def check(self):
+        """ Prints the warnings, and raises ValueError if there are any errors """
+        for warning in self.warnings():
+            print(f"Warning: {warning}", file=sys.stderr)
+        errors = self.errors()
+        if errors:
+            raise ValueError(f"The {self.name} dataset has bad inputs:\n  " + "\n  ".join(errors))
+
+
+def _segment_medians(values: np.ndarray, segment: np.ndarray, segments: int) -> np.ndarray:
+    """ The median of values in each segment, with one sort for all of them. NaN for empty segments """
+    order = np.lexsort((values, segment))
+    counts = np.bincount(segment, minlength=segments)
+    starts = np.cumsum(counts) - counts
+    medians = np.full(segments, np.nan)
+    has = counts > 0
+    medians[has] = values[order][starts[has] + counts[has] // 2]
+    return medians
+
+
+def scan_arrays(name: str, files: List[str], positions: List[np.ndarray], timestamps: List[np.ndarray],
+                max_offset: float | None = None, jump_factor: float = JUMP_FACTOR) -> IntegrityReport:
+    """ Checks the trajectories, the first of which is the ground truth """
+    lengths = np.array([len(p) for p in positions])
+    segment = np.repeat(np.arange(len(files)), lengths)
+    xy = np.concatenate(positions).astype(float, copy=False)
+    t = np.concatenate(timestamps).astype(float, copy=False)
+    flags = np.zeros(len(t), dtype=np.uint8)
+
+    flags[~(np.isfinite(xy).all(axis=1) & np.isfinite(t))] |= NON_FINITE
+
+    # Steps between consecutive poses of the same trajectory
+    same = segment[1:] == segment[:-1]
+    dt = np.diff(t)
+    flags[1:][same & (dt < 0)] |= BACKWARDS
+    flags[1:][same & (dt == 0)] |= DUPLICATE
+
+    step = np.sqrt((np.diff(xy, axis=0) ** 2).sum(axis=1))
+    measured = same & np.isfinite(step)
+    medians = _segment_medians(step[measured], segment[1:][measured], len(files))
+    with np.errstate(invalid="ignore"):
+        jumps = measured & (step > jump_factor * medians[segment[1:]]) & (medians[segment[1:]] > 0)
+    flags[1:][jumps] |= JUMP
+
+    # Poses the ground truth can't be matched with. Only worth it if the ground truth is in order
+    ground_truth = slice(0, lengths[0])
+    if not (flags[ground_truth] & ERRORS).any() and lengths[0]:
+        _, matched = associate(t[lengths[0]:], t[ground_truth], xy[ground_truth], max_offset)
+        flags[lengths[0]:][~matched] |= UNMATCHED
+
+    # How much of the ground truth's time span each trajectory covers
+    with np.errstate(invalid="ignore", divide="ignore"):
+        first = np.where(lengths > 0, t[np.minimum(np.cumsum(lengths) - lengths, len(t) - 1)], np.nan)
+        last = np.where(lengths > 0, t[np.maximum(np.cumsum(lengths) - 1, 0)], np.nan)
+        span = last - first
+        coverage = np.clip(span / span[0], 0, 1) if span[0] > 0 else np.ones(len(files))
+    return IntegrityReport(name, files, lengths, flags, np.nan_to_num(coverage))
+
+
+# dataset name -> report we have already made in this process
+_scanned: Dict[str, IntegrityReport] = {}
+
+
+def scan(dataset) -> IntegrityReport:
+    """ Checks the ground truth and every trajectory of a dataset (see datasets.py), once per process """
+    if dataset.name not in _scanned:
+        systems = [dataset.ground_truth] + dataset.systems
+        _scanned[dataset.name] = scan_arrays(
+            dataset.name,
+            [system.file for system in systems],
+            [dataset.load(system) for system in systems],
+            [dataset.load_timestamps(system) for system in systems],
+            dataset.max_offset,
+        )
+    return _scanned[dataset.name]
+
+
+if __name__ == "__main__":
+    from scripts.reusable_code.datasets import DATASETS
+
+    failed = False
+    for dataset in DATASETS:
+        report = scan(dataset)
+        problems = report.errors() + report.warnings()
+        print(f"{dataset.name}: {len(report.flags)} poses, {len(report.errors())} errors, "
+              f"{len(report.warnings())} warnings")
+        for problem in problems:
+            print(f"  {problem}")
+        failed |= bool(report.errors())
+    sys.exit(1 if failed else 0)
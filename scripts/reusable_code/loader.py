@@ -0,0 +1,133 @@
+# Loads the trajectories in raw_data/ and damaged_data/
+#
+# Every trajectory is loaded at most once per process: load_trajectory() remembers what it returned, so the
+# OdomPlot, RmsePlot and GpsData of a script all share one array.
+#
+# The .npz files are compressed, so np.load has to decompress the whole file every time. Instead, the first
+# script to load a file writes an uncompressed copy of each array to .build/cache/trajectories/, and every script
+# after that memory-maps the copy read-only. The pages come straight from the OS page cache, so scripts running
+# at the same time share them too. The copy is checked against the sha256 of the .npz, and rewritten when it
+# changes.
+#
+# A trajectory can also have a "timestamps" array, with the time of each position (see association.py).
+#
+# Trajectories (the "data" array) come from the dataset's consolidated archive instead (see archive.py), so a
+# script maps one file for the whole dataset rather than one per system.
+
+import hashlib
+import json
+import os
+from typing import Dict, Tuple
+
+import numpy as np
+
+from scripts.reusable_code import archive, shared_data, timing
+
+CACHE_DIR = ".build/cache/trajectories"
+
+# (path, key) -> array we have already loaded in this process
+_loaded: Dict[Tuple[str, str], np.ndarray] = {}
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json(path: str, data: dict):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def cached_npy(path: str, key: str, cache_dir: str = CACHE_DIR) -> str:
+    """ The path of an uncompressed .npy copy of npz[key], converting the .npz if the copy is missing or stale """
+    name = os.path.normpath(path).replace(os.sep, ".")
+    npy_path = os.path.join(cache_dir, f"{name}.{key}.npy")
+    info_path = os.path.join(cache_dir, f"{name}.json")
+
+    stat = os.stat(path)
+    try:
+        with open(info_path) as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        info = {}
+
+    # Same fast path as the manifest: don't hash the .npz if its mtime and size haven't changed
+    if info.get("mtime") == stat.st_mtime_ns and info.get("size") == stat.st_size:
+        if key not in info.get("keys", []):
+            # e.g. a trajectory without timestamps, don't convert the whole file again to find out
+            raise KeyError(f"{key} is not a file in the archive {path}")
+        if os.path.isfile(npy_path):
+            return npy_path
+
+    sha = _sha256(path)
+    if info.get("sha256") == sha and key in info.get("keys", []) and os.path.isfile(npy_path):
+        # Touched but not changed
+        _write_json(info_path, info | {"mtime": stat.st_mtime_ns, "size": stat.st_size})
+        return npy_path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    keys = []
+    with np.load(path) as npz:
+        for k in npz.files:
+            target = os.path.join(cache_dir, f"{name}.{k}.npy")
+            # np.save adds .npy unless the name already ends with it
+            tmp = f"{target}.{os.getpid()}.tmp.npy"
+            np.save(tmp, npz[k])
+            os.replace(tmp, target)
+            keys.append(k)
+    _write_json(info_path, {"mtime": stat.st_mtime_ns, "size": stat.st_size, "sha256": sha, "keys": keys})
+    if key not in keys:
+        raise KeyError(f"{key} is not a file in the archive {path}")
+    return npy_path
+
+
+def _from_archive(path: str) -> np.ndarray | None:
+    data_dir, file = os.path.split(path)
+    try:
+        dataset = archive.open_archive(data_dir or ".")
+    except (OSError, ValueError, KeyError):
+        # Can't write the archive, or one of the files doesn't fit in it
+        return None
+    file = file.removesuffix(".npz")
+    return dataset[file] if file in dataset else None
+
+
+def load_array(path: str, key: str = "data") -> np.ndarray:
+    """ A read-only array from a .npz file, loaded at most once per process """
+    path = os.path.normpath(path)
+    if (path, key) in _loaded:
+        return _loaded[(path, key)]
+
+    with timing.phase("np.load"):
+        # When run by ./build.py, use the copy build.py decoded into shared memory (see shared_data.py)
+        data = shared_data.attach(path, key)
+        if data is None and key == "data":
+            data = _from_archive(path)
+        if data is None:
+            try:
+                data = np.load(cached_npy(path, key), mmap_mode="r")
+            except OSError:
+                # We can't write the cache (e.g. a read-only checkout), just load the file
+                data = np.load(path)[key]
+                data.flags.writeable = False
+    _loaded[(path, key)] = data
+    return data
+
+
+def load_trajectory(path: str) -> np.ndarray:
+    """ The N x 2 array of x, y positions in a trajectory .npz file """
+    return load_array(path, "data")
+
+
+def load_timestamps(path: str) -> np.ndarray | None:
+    """ The time (in seconds) of each position in a trajectory .npz file, or None if it doesn't have any """
+    try:
+        return load_array(path, "timestamps")
+    except KeyError:
+        return None
@@ -0,0 +1,172 @@
+# Build manifest, so ./build.py only re-runs scripts whose inputs changed
+#
+# For every script we record the sha256 of:
+#  - the script itself
+#  - every scripts.* module it imports (recursively), e.g. bars2.py -> performance.py, power.py, constants.py
+#  - every .npz (or TUM, KITTI or EuRoC file) it loads from a dataset directory (see datasets.py)
+#  - the .pgf plots it wrote
+#
+# Hashing every file on every build would be slow too, so we also store the mtime and size of each file.
+# If those haven't changed since we last hashed the file, we trust the stored hash.
+
+import ast
+import hashlib
+import json
+import os
+from typing import Dict, List, Set
+
+from scripts.reusable_code.datasets import DATA_DIRS
+from scripts.reusable_code.formats import EXTENSIONS
+
+MANIFEST_PATH = ".build/manifest.json"
+
+# Trajectories are .npz files, or files the SLAM systems wrote themselves (see formats.py)
+DATA_EXTENSIONS = (".npz",) + tuple(EXTENSIONS)
+
+
+def script_module(script_path: str) -> str:
+    """ scripts/figures/path.py -> scripts.figures.path """
+    return script_path.removesuffix('.py').replace('/', '.')
+
+
+def plot_name(script_path: str) -> str:
+    """ scripts/dataset1/bars2.py -> dataset1.bars2, the same naming each script uses for its .pgf """
+    return script_path.removesuffix('.py').removeprefix('scripts/').replace('/', '.')
+
+
+def module_file(module: str) -> str | None:
+    """ Finds the file for a scripts.* module, or None if it isn't one of ours """
+    path = module.replace('.', '/')
+    if os.path.isfile(path + ".py"):
+        return path + ".py"
+    if os.path.isfile(os.path.join(path, "__init__.py")):
+        return os.path.join(path, "__init__.py")
+    return None
+
+
+def _imported_files(tree: ast.AST) -> Set[str]:
+    """ All the scripts.* files imported by a parsed module """
+    files = set()
+    for node in ast.walk(tree):
+        modules = []
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module is not None and node.level == 0:
+            # `from scripts.dataset1 import performance` might import a module or a name from a package
+            modules = [node.module] + [node.module + "." + alias.name for alias in node.names]
+
+        for module in modules:
+            if not module.startswith("scripts"):
+                continue
+            # Importing scripts.a.b also runs scripts/__init__.py and scripts/a/__init__.py
+            parts = module.split('.')
+            for i in range(1, len(parts) + 1):
+                file = module_file('.'.join(parts[:i]))
+                if file is not None:
+                    files.add(file)
+    return files
+
+
+def _string_constants(tree: ast.AST) -> Set[str]:
+    return {node.value for node in ast.walk(tree) if isinstance(node, ast.Constant) and isinstance(node.value, str)}
+
+
+def find_dependencies(script_path: str) -> List[str]:
+    """ Every file that can change the output of a script: itself, its scripts.* imports and its .npz data """
+    todo = [script_path]
+    sources: Set[str] = set()
+    strings: Set[str] = set()
+    while todo:
+        file = todo.pop()
+        if file in sources:
+            continue
+        sources.add(file)
+        with open(file) as f:
+            tree = ast.parse(f.read(), filename=file)
+        strings |= _string_constants(tree)
+        todo.extend(_imported_files(tree) - sources)
+
+    # Scripts load data with things like np.load(PREFIX + "rtabmap_slam_traj.npz"),
+    # so we look for data directories and trajectory file names anywhere in the script or its imports
+    data_dirs = {s.strip('/') for s in strings if s.strip('/') in DATA_DIRS}
+    npz_names = {s for s in strings if s.endswith(DATA_EXTENSIONS)}
+
+    data = set()
+    for data_dir in data_dirs:
+        for name in npz_names:
+            path = os.path.join(data_dir, name)
+            if os.path.isfile(path):
+                data.add(path)
+    # If we can't tell which files are used, depend on the whole directory to be safe
+    for data_dir in data_dirs:
+        if not any(path.startswith(data_dir + "/") for path in data):
+            data |= {os.path.join(data_dir, f) for f in os.listdir(data_dir) if f.endswith(DATA_EXTENSIONS)}
+
+    return sorted(sources | data)
+
+
+class Manifest:
+    """ Remembers what each script was built from, so we can tell when its plots are still current """
+    def __init__(self, path: str = MANIFEST_PATH):
+        self.path = path
+        # path -> {"mtime": ..., "size": ..., "sha256": ...}
+        self.files: Dict[str, dict] = {}
+        # module -> {"inputs": {path: sha256}, "outputs": {path: sha256}}
+        self.scripts: Dict[str, dict] = {}
+
+        if os.path.isfile(path):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+                self.files = data.get("files", {})
+                self.scripts = data.get("scripts", {})
+            except (OSError, ValueError):
+                # A broken manifest just means a full rebuild
+                pass
+
+    def hash_file(self, path: str) -> str | None:
+        """ sha256 of a file, using the mtime+size fast path when we can. None if the file doesn't exist """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.files.pop(path, None)
+            return None
+
+        known = self.files.get(path)
+        if known is not None and known["mtime"] == stat.st_mtime_ns and known["size"] == stat.st_size:
+            return known["sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        sha = digest.hexdigest()
+        self.files[path] = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "sha256": sha}
+        return sha
+
+    def hash_inputs(self, script_path: str) -> Dict[str, str | None]:
+        return {path: self.hash_file(path) for path in find_dependencies(script_path)}
+
+    def is_current(self, script_path: str, inputs: Dict[str, str | None]) -> bool:
+        """ True if the script's recorded inputs are unchanged and its plots are still the ones it wrote """
+        entry = self.scripts.get(script_module(script_path))
+        if entry is None or entry["inputs"] != inputs:
+            return False
+        return all(self.hash_file(path) == sha for path, sha in entry["outputs"].items())
+
+    def record(self, script_path: str, inputs: Dict[str, str | None], outputs: List[str]):
+        """ Call after a script succeeds. inputs should be hashed *before* the script ran """
+        self.scripts[script_module(script_path)] = {
+            "inputs": inputs,
+            "outputs": {path: self.hash_file(path) for path in outputs},
+        }
+
+    def forget(self, script_path: str):
+        self.scripts.pop(script_module(script_path), None)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"files": self.files, "scripts": self.scripts}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
@@ -0,0 +1,318 @@
+# The error of every system in a dataset against the ground truth, computed for all of them at once
+#
+# Instead of every RmsePlot working out its own squared error, distance and RMSE (with a few temporary arrays each),
+# BatchMetrics stacks the trajectories into one (systems, samples, dims) array, padded to the longest one, with a
+# (systems, samples) mask of the poses that count. Systems on the same clock (like every .npz without timestamps)
+# are matched with the ground truth in one association.py call for all of them, and then the squared
+# error, ATE, RMSE and cumulative RMSE of every system come out of a handful of NumPy passes over the stacked arrays,
+# written into arrays allocated once up front.
+#
+# rolling_rmse() gives the RMSE over a sliding window of poses, for as many window lengths as you like, from two
+# running sums, so it shows whether a system recovers after it gets lost.
+#
+# metrics.aligned("sim2") gives the same metrics after lining each system up with the ground truth (see
+# alignment.py), reusing the association. RmsePlot (trajectory_plots.py) is just a view of one row of these arrays.
+#
+# All of these arrays only depend on the input arrays, so they're kept in the derived cache (see derived.py), keyed
+# by a hash of the inputs. When the runs haven't changed since the last build, a script just memory-maps them.
+#
+#     python3 -m scripts.reusable_code.metrics --benchmark     # compares with one system at a time
+
+import argparse
+import copy
+import time
+import warnings
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from scripts.reusable_code import derived, integrity, timing
+from scripts.reusable_code.alignment import Alignment, align
+from scripts.reusable_code.association import associate
+
+
+def _shares_clock(t: np.ndarray, clock: np.ndarray) -> bool:
+    """ True if the timestamps are the start of clock, like the default timestamps of two .npz files """
+    if t is clock:
+        return True
+    n = len(t)
+    if n > len(clock):
+        return False
+    # Most different clocks already differ at one of the ends
+    return n == 0 or (t[0] == clock[0] and t[-1] == clock[n - 1] and np.array_equal(t, clock[:n]))
+
+
+# The arrays of a BatchMetrics that are kept in the derived cache (see derived.py)
+CACHED = ("positions", "ground_truth", "t", "valid", "count", "sqdist", "dist", "cumulative_rmse", "rmse", "mean",
+          "max")
+
+
+class BatchMetrics:
+    """ The errors of many trajectories against the same ground truth, as (systems, samples) arrays """
+    def __init__(self, names: List[str], trajectories: List[np.ndarray], timestamps: List[np.ndarray],
+                 gt_positions: np.ndarray, gt_t: np.ndarray, masks: List[np.ndarray] | None = None,
+                 max_offset: float | None = None, cache: bool = True):
+        self.names = names
+        self.gt_t = gt_t
+        self.lengths = np.array([len(trajectory) for trajectory in trajectories], dtype=int)
+        # Whether to use the derived cache (see derived.py)
+        self.cache = cache
+
+        # How each system was lined up with the ground truth (see alignment.py), None for the raw positions
+        self.alignment: Alignment | None = None
+        # (mode, first) -> metrics of the aligned positions
+        self._aligned: Dict[Tuple[str, int | None], BatchMetrics] = {}
+
+        # Everything else only depends on the inputs, so if we've seen them before it's all in the derived cache
+        with timing.phase("metrics key"):
+            self.key = derived.digest(
+                list(trajectories) + list(timestamps) + [gt_positions, gt_t] + list(masks or []),
+                {"metric": "errors", "max_offset": max_offset, "masks": masks is not None},
+            )
+        self.restore(lambda: self.associate(trajectories, timestamps, gt_positions, gt_t, masks, max_offset))
+
+    def associate(self, trajectories: List[np.ndarray], timestamps: List[np.ndarray], gt_positions: np.ndarray,
+                  gt_t: np.ndarray, masks: List[np.ndarray] | None, max_offset: float | None):
+        """ Stacks the trajectories, and matches every pose with the ground truth """
+        shape = (len(self.names), int(self.lengths.max(initial=0)))
+        dims = gt_positions.shape[1:]
+        with timing.phase("metrics association"):
+            # Padding is NaN, and never valid
+            self.positions = np.full(shape + dims, np.nan)
+            self.ground_truth = np.full(shape + dims, np.nan)
+            self.t = np.full(shape, np.nan)
+            self.valid = np.zeros(shape, dtype=bool)
+
+            # Runs on the same clock (or the start of it) are matched with the ground truth once per clock
+            clocks: List[np.ndarray] = []
+            matches: List[Tuple[np.ndarray, np.ndarray]] = []
+            for i in sorted(range(len(timestamps)), key=lambda i: -len(timestamps[i])):
+                t = timestamps[i]
+                clock = next((c for c, clock in enumerate(clocks) if _shares_clock(t, clock)), None)
+                if clock is None:
+                    clock = len(clocks)
+                    clocks.append(t)
+                    matches.append(associate(t, gt_t, gt_positions, max_offset))
+                matched_gt, matched = matches[clock]
+                n = len(t)
+                self.positions[i, :n] = trajectories[i]
+                self.t[i, :n] = t
+                self.ground_truth[i, :n] = matched_gt[:n]
+                self.valid[i, :n] = matched[:n]
+                # Leave out the broken poses too
+                if masks is not None:
+                    self.valid[i, :n] &= masks[i]
+            self.count = self.valid.sum(axis=1)
+
+    def restore(self, build: Callable[[], Dict[str, np.ndarray] | None]) -> Dict[str, np.ndarray]:
+        """
+        Sets the CACHED arrays from the derived cache, or else from build() and compute(). Returns them
+
+        build() sets self.positions, self.ground_truth, self.t, self.valid and self.count, and can return more
+        arrays to cache with them.
+        """
+        def compute() -> Dict[str, np.ndarray]:
+            extra = build() or {}
+            self.allocate()
+            with timing.phase("metrics"):
+                self.compute()
+            return {name: getattr(self, name) for name in CACHED} | extra
+
+        arrays = derived.cached(self.key, compute) if self.cache else compute()
+        for name in CACHED:
+            setattr(self, name, arrays[name])
+        self._median: np.ndarray | None = None
+        # Running sums of the squared errors and valid poses, for rolling_rmse()
+        self._running: Tuple[np.ndarray, np.ndarray] | None = None
+        return arrays
+
+    def cached(self, name: str, params: dict, compute: Callable[[], Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+        """ Arrays worked out from these metrics, from the derived cache if they have been before """
+        if not self.cache:
+            return compute()
+        return derived.cached(derived.digest([], {"metric": name, "errors": self.key} | params), compute)
+
+    def allocate(self):
+        """ The arrays compute() fills in """
+        shape = self.valid.shape
+        self.sqdist = np.empty(shape)
+        self.dist = np.empty(shape)
+        self.cumulative_rmse = np.empty(shape)
+        self.rmse = np.empty(len(self.names))
+        # ATE statistics, over the valid poses of each system
+        self.mean = np.empty(len(self.names))
+        self.max = np.empty(len(self.names))
+
+    def compute(self):
+        """ Fills in the errors from self.positions and self.ground_truth """
+        invalid = ~self.valid
+        diff = np.subtract(self.positions, self.ground_truth)
+        np.einsum("snd,snd->sn", diff, diff, out=self.sqdist)
+        del diff
+        # Poses that don't count add nothing to the sums
+        np.copyto(self.sqdist, 0, where=invalid)
+
+        np.cumsum(self.sqdist, axis=1, out=self.cumulative_rmse)
+        totals = self.cumulative_rmse[:, -1].copy() if self.cumulative_rmse.shape[1] else np.zeros(len(self.names))
+        counts = np.cumsum(self.valid, axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            np.divide(self.cumulative_rmse, counts, out=self.cumulative_rmse)
+            np.sqrt(self.cumulative_rmse, out=self.cumulative_rmse)
+            np.sqrt(totals / self.count, out=self.rmse)
+
+        np.sqrt(self.sqdist, out=self.dist)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            np.divide(self.dist.sum(axis=1), self.count, out=self.mean)
+        np.max(self.dist, axis=1, initial=0, out=self.max)
+        self.max[self.count == 0] = np.nan
+        # Like before, poses that don't count are NaN in the curves
+        np.copyto(self.sqdist, np.nan, where=invalid)
+        np.copyto(self.dist, np.nan, where=invalid)
+
+    def median(self) -> np.ndarray:
+        """ The median ATE of each system. It needs a sort, so it's only worked out when something asks for it """
+        if self._median is None:
+            with warnings.catch_warnings():
+                # Systems without any valid poses get NaN
+                warnings.simplefilter("ignore", RuntimeWarning)
+                self._median = np.nanmedian(self.dist, axis=1)
+        return self._median
+
+    def aligned(self, mode: str = "se2", first: int | None = None) -> "BatchMetrics":
+        """
+        The same metrics after aligning every system with the ground truth (see alignment.py)
+
+        Aligns on the first that many matched poses of each system, or on the whole run. The association and the
+        raw metrics (self) are reused, and each alignment is only worked out once.
+        """
+        key = (mode, first)
+        if key not in self._aligned:
+            with timing.phase(f"align {mode}"):
+                aligned = copy.copy(self)
+                aligned._aligned = {}
+                aligned.key = derived.digest([], {"metric": "aligned", "errors": self.key, "mode": mode,
+                                                  "first": first})
+
+                def build() -> Dict[str, np.ndarray]:
+                    alignment = align(self.positions, self.ground_truth, self.valid, mode, first)
+                    aligned.positions = alignment.apply(self.positions)
+                    return {"rotation": alignment.rotation, "translation": alignment.translation,
+                            "scale": alignment.scale}
+
+                arrays = aligned.restore(build)
+                aligned.alignment = Alignment(mode, arrays["rotation"], arrays["translation"], arrays["scale"])
+            self._aligned[key] = aligned
+        return self._aligned[key]
+
+    def rolling_rmse(self, windows: Sequence[int]) -> np.ndarray:
+        """
+        The RMSE over the last window poses of every pose, for every window, as (systems, windows, samples)
+
+        Each window is the difference of two running sums, so it costs the same whatever its length. Poses before
+        the first full window are NaN, as are windows without any valid poses.
+        """
+        windows = np.asarray(windows, dtype=int)
+        if (windows < 1).any():
+            raise ValueError("Rolling RMSE windows have to be at least 1 pose")
+        return self.cached("rolling_rmse", {"windows": windows.tolist()},
+                           lambda: {"rolling": self._rolling_rmse(windows)})["rolling"]
+
+    def _rolling_rmse(self, windows: np.ndarray) -> np.ndarray:
+        with timing.phase("rolling rmse"):
+            if self._running is None:
+                # Running sums with a 0 in front, so the sum of poses [a, b) is sums[b] - sums[a]
+                shape = (len(self.names), self.valid.shape[1] + 1)
+                sums = np.zeros(shape)
+                np.cumsum(np.where(self.valid, self.sqdist, 0.0), axis=1, out=sums[:, 1:])
+                counts = np.zeros(shape, dtype=int)
+                np.cumsum(self.valid, axis=1, out=counts[:, 1:])
+                self._running = sums, counts
+            sums, counts = self._running
+
+            ends = np.arange(1, self.valid.shape[1] + 1)
+            starts = ends[None, :] - windows[:, None]
+            full = starts >= 0
+            starts = np.maximum(starts, 0)
+            # Rounding can leave a tiny negative sum where the errors are ~0
+            window_sums = np.maximum(sums[:, ends][:, None, :] - sums[:, starts], 0.0)
+            window_counts = counts[:, ends][:, None, :] - counts[:, starts]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rolling = np.sqrt(window_sums / window_counts)
+            rolling[:, ~full] = np.nan
+        return rolling
+
+    def row(self, i: int) -> slice:
+        """ The samples of system i, without the padding """
+        return slice(0, self.lengths[i])
+
+
+# (dataset name, system files) -> metrics we have already computed in this process
+_computed: Dict[Tuple[str, Tuple[str, ...]], BatchMetrics] = {}
+
+
+def for_dataset(dataset, systems=None) -> BatchMetrics:
+    """ The metrics of some (by default all) of a dataset's systems, leaving out poses integrity.py flagged """
+    systems = dataset.systems if systems is None else systems
+    key = (dataset.name, tuple(system.file for system in systems))
+    if key not in _computed:
+        report = integrity.scan(dataset)
+        _computed[key] = BatchMetrics(
+            [system.name for system in systems],
+            [dataset.load(system) for system in systems],
+            [dataset.load_timestamps(system) for system in systems],
+            dataset.load_ground_truth(),
+            dataset.load_timestamps(dataset.ground_truth),
+            masks=[report.usable(system.file) for system in systems],
+            max_offset=dataset.max_offset,
+        )
+    return _computed[key]
+
+
+def _one_at_a_time(trajectories, timestamps, gt_positions, gt_t):
+    """ What every RmsePlot used to do for itself, for the benchmark """
+    for trajectory, t in zip(trajectories, timestamps):
+        gt, valid = associate(t, gt_t, gt_positions)
+        sqdist = ((trajectory[:, 0] - gt[:, 0]) ** 2) + ((trajectory[:, 1] - gt[:, 1]) ** 2)
+        sqdist = np.where(valid, sqdist, np.nan)
+        np.sqrt(sqdist)
+        np.sqrt(sqdist[valid].mean())
+        np.sqrt(np.cumsum(np.where(valid, sqdist, 0)) / np.cumsum(valid))
+
+
+def benchmark(sizes: List[Tuple[int, int]], repeat: int = 3):
+    """ Times BatchMetrics against one system at a time, for (systems, samples) sizes """
+    rng = np.random.default_rng(0)
+    print(f"{'systems':>8}{'samples':>10}{'one at a time':>16}{'batched':>10}{'speedup':>9}")
+    for systems, samples in sizes:
+        gt_t = np.arange(samples, dtype=float)
+        gt = np.cumsum(rng.normal(size=(samples, 2)), axis=0)
+        # Ragged, like real runs that stopped early
+        lengths = rng.integers(samples // 2, samples + 1, size=systems)
+        trajectories = [gt[:n] + rng.normal(scale=0.5, size=(n, 2)) for n in lengths]
+        # Half of them on the same clock as the ground truth, half on their own
+        timestamps = [gt_t[:n] + (0.25 if k % 2 else 0.0) for k, n in enumerate(lengths)]
+
+        times = {}
+        for name, run in [
+            ("loop", lambda: _one_at_a_time(trajectories, timestamps, gt, gt_t)),
+            ("batched", lambda: BatchMetrics([""] * systems, trajectories, timestamps, gt, gt_t, cache=False)),
+        ]:
+            best = np.inf
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run()
+                best = min(best, time.perf_counter() - start)
+            times[name] = best
+        print(f"{systems:>8}{samples:>10}{times['loop']:>15.3f}s{times['batched']:>9.3f}s"
+              f"{times['loop'] / times['batched']:>8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-system error metrics")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="time the batched metrics against one system at a time, from 7 to 500 systems")
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark([(7, 5336), (100, 10_000), (500, 10_000), (7, 1_000_000)])
+    else:
+        parser.print_help()
@@ -0,0 +1,222 @@
+# A pre-warmed process that renders plot scripts for ./build.py
+#
+# Starting `python3 -m scripts.figures.path` from cold means importing numpy, matplotlib and pandas and
+# loading the pgf backend, which is a big chunk of a small plot's wall time. The render server does all of
+# that once, then forks a fresh child for every script. The child runs the script as __main__, exactly like
+# `python3 -m` would, and gets the third-party imports for free. Our own modules are always imported fresh in the
+# child, so in --watch mode an edit to style.py or constants.py is picked up by the next render.
+#
+# build.py talks to the server over two pipes with one JSON object per line:
+#   build.py -> server: {"id": 3, "module": "scripts.figures.path"}
+#   build.py -> server: {"cancel": 3}    (kills the script, e.g. because its inputs changed again in --watch mode)
+#   server -> build.py: {"id": 3, "pid": 1234, "returncode": 0, "duration": 4.2, "max_rss": 123456789}
+
+import atexit
+import json
+import os
+import runpy
+import select
+import signal
+import subprocess
+import sys
+import time
+import traceback
+from typing import Dict, Tuple
+
+from scripts.reusable_code.scheduler import Job
+
+
+def warm_up():
+    """
+    Everything the plot scripts would otherwise do on every cold start
+
+    Only third-party packages. Our own modules (style.py, constants.py...) get edited while --watch is running, and a
+    child forked with the old ones in memory would render the old code. Each script sets up matplotlib itself.
+    """
+    import numpy  # noqa: F401
+    import pandas  # noqa: F401
+    import matplotlib.pyplot  # noqa: F401
+    import matplotlib.collections  # noqa: F401
+    import matplotlib.backends.backend_pgf  # noqa: F401
+    # Loads (or builds) the font cache
+    import matplotlib.font_manager  # noqa: F401
+
+
+def forget_our_modules():
+    """ Drops every scripts.* module, so the child imports them (and sees any edits) from disk again """
+    for name in [name for name in sys.modules if name == "scripts" or name.startswith("scripts.")]:
+        del sys.modules[name]
+
+
+def run_module(module: str) -> int:
+    """ Runs a module as __main__ like `python3 -m module`, and returns its exit code """
+    sys.argv = [module]
+    try:
+        runpy.run_module(module, run_name="__main__", alter_sys=True)
+        return 0
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        print(e.code, file=sys.stderr)
+        return 1
+    except BaseException:
+        traceback.print_exc()
+        return 1
+
+
+def serve(request_fd: int, reply_fd: int):
+    warm_up()
+
+    # Wake up select() whenever a child exits
+    wakeup_r, wakeup_w = os.pipe()
+    os.set_blocking(wakeup_w, False)
+    signal.set_wakeup_fd(wakeup_w)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+    # pid -> (request id, start time)
+    children: Dict[int, Tuple[int, float]] = {}
+    buffer = b""
+    closed = False
+
+    def reply(message: dict):
+        os.write(reply_fd, (json.dumps(message) + "\n").encode())
+
+    while not closed or children:
+        readable, _, _ = select.select([wakeup_r] + ([] if closed else [request_fd]), [], [])
+
+        if wakeup_r in readable:
+            os.read(wakeup_r, 4096)
+
+        if request_fd in readable:
+            data = os.read(request_fd, 65536)
+            if not data:
+                # build.py is done with us, finish the scripts we have and exit
+                closed = True
+            buffer += data
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                request = json.loads(line)
+
+                if "cancel" in request:
+                    for pid, (request_id, start) in children.items():
+                        if request_id == request["cancel"]:
+                            os.kill(pid, signal.SIGTERM)
+                    continue
+
+                pid = os.fork()
+                if pid == 0:
+                    # The child: forget about the server, and become the script
+                    signal.set_wakeup_fd(-1)
+                    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                    for fd in (request_fd, reply_fd, wakeup_r, wakeup_w):
+                        os.close(fd)
+                    forget_our_modules()
+                    code = run_module(request["module"])
+                    # os._exit skips atexit, but the scripts rely on it to save their phase timings
+                    # and LaTeX text sizes, so run it ourselves
+                    atexit._run_exitfuncs()
+                    sys.stdout.flush()
+                    sys.stderr.flush()
+                    os._exit(code)
+                children[pid] = (request["id"], time.monotonic())
+
+        # Reap every child that has finished
+        while children:
+            pid, status, rusage = os.wait4(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            request_id, start = children.pop(pid)
+            reply({
+                "id": request_id,
+                "pid": pid,
+                "returncode": os.waitstatus_to_exitcode(status),
+                "duration": time.monotonic() - start,
+                # ru_maxrss is in KiB on linux
+                "max_rss": rusage.ru_maxrss * 1024,
+            })
+
+
+class ForkServerRunner:
+    """ Runs jobs in the render server instead of a new interpreter. Same interface as SubprocessRunner """
+    def __init__(self):
+        request_r, self.request_w = os.pipe()
+        self.reply_r, reply_w = os.pipe()
+        self.server = subprocess.Popen(
+            ["python3", "-m", "scripts.reusable_code.render_server", str(request_r), str(reply_w)],
+            pass_fds=(request_r, reply_w),
+        )
+        os.close(request_r)
+        os.close(reply_w)
+        self.buffer = b""
+
+        self.next_id = 0
+        self.running: Dict[int, Job] = {}
+
+    def _send(self, request: dict):
+        os.write(self.request_w, (json.dumps(request) + "\n").encode())
+
+    def start(self, job: Job):
+        self.next_id += 1
+        self.running[self.next_id] = job
+        self._send({"id": self.next_id, "module": job.module})
+
+    def cancel(self, job: Job):
+        for request_id, running_job in self.running.items():
+            if running_job is job:
+                self._send({"cancel": request_id})
+
+    def wait(self, timeout: float | None = None) -> Job | None:
+        """ Blocks until any running job finishes and returns it, or returns None after `timeout` seconds """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while b"\n" not in self.buffer:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select([self.reply_r], [], [], remaining)
+            if not readable:
+                return None
+            data = os.read(self.reply_r, 65536)
+            if not data:
+                raise RuntimeError("The render server exited unexpectedly")
+            self.buffer += data
+
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        result = json.loads(line)
+        job = self.running.pop(result["id"])
+        job.pid = result["pid"]
+        job.returncode = result["returncode"]
+        job.duration = result["duration"]
+        job.max_rss = result["max_rss"]
+        return job
+
+    def close(self):
+        os.close(self.request_w)
+        self.server.wait()
+        os.close(self.reply_r)
+
+
+def benchmark(module: str, repeat: int = 3):
+    """ Times rendering one script from a cold interpreter vs. forked from the warm render server """
+    from scripts.reusable_code.scheduler import SubprocessRunner
+
+    results = {}
+    # One runner at a time, so they don't compete for the CPU
+    for name, make_runner in [("cold (python3 -m)", SubprocessRunner), ("warm (render server)", ForkServerRunner)]:
+        runner = make_runner()
+        durations = []
+        for _ in range(repeat):
+            runner.start(Job(module.replace('.', '/') + ".py", module))
+            job = runner.wait()
+            if job.returncode != 0:
+                print(f"  ! {module} exited with {job.returncode}")
+            durations.append(job.duration)
+        runner.close()
+        results[name] = min(durations)
+        print(f"  {name:<22} best of {repeat}: {min(durations):.2f}s (mean {sum(durations) / len(durations):.2f}s)")
+
+    cold, warm = results.values()
+    print(f"  speedup: {cold / warm:.1f}x")
+
+
+if __name__ == "__main__":
+    serve(int(sys.argv[1]), int(sys.argv[2]))
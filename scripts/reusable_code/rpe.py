@@ -0,0 +1,158 @@
+# Relative Pose Error: how much each system drifts over a fixed number of poses, or a fixed time
+#
+# The ATE in metrics.py says how far a system is from the GPS, which after a while is mostly the drift it piled up
+# early on. The RPE over a delta compares how far the system moved between two poses with how far the GPS moved
+# between the same two times:
+#
+#     |(p[i + delta] - p[i]) - (gt[i + delta] - gt[i])|  =  |error[i + delta] - error[i]|
+#
+# so it's the change of the (systems, samples, dims) error vectors of a BatchMetrics over delta poses. We only have
+# positions, so this is the translational part. The displacements are compared in the GPS frame, so use
+# metrics.aligned() (see alignment.py) first if the systems' maps face a different way.
+#
+# The error vectors are padded with NaN at the end by the largest delta, and np.lib.stride_tricks.sliding_window_view
+# gives every (pose, pose + k) pair as a view, so all the deltas of all the systems are one gather and one subtraction.
+# Time deltas find the pose delta seconds later with one searchsorted over every system's timestamps.
+#
+#     python3 -m scripts.reusable_code.rpe          # prints the RPE of every system of every dataset
+
+import warnings
+from typing import Dict, Sequence
+
+import numpy as np
+
+from scripts.reusable_code import timing
+from scripts.reusable_code.metrics import BatchMetrics
+
+# The percentiles reported for each delta
+PERCENTILES = (50, 90, 99)
+
+# The deltas the CLI prints, in poses
+DEFAULT_DELTAS = (1, 10, 100)
+
+
+class RelativeError:
+    """ Struct class for the RPE of every system over every delta, as (systems, deltas, ...) arrays """
+    def __init__(self, names, lengths: np.ndarray, deltas: np.ndarray, unit: str, t: np.ndarray, errors: np.ndarray,
+                 percentiles: Sequence[float] = PERCENTILES):
+        self.names = names
+        self.lengths = lengths
+        self.deltas = deltas
+        # "poses" or "seconds"
+        self.unit = unit
+        # (systems, samples), the time of the first pose of each pair
+        self.t = t
+        # (systems, deltas, samples). NaN where either pose of the pair doesn't count, or there's no pair
+        self.errors = errors
+
+        counted = ~np.isnan(errors)
+        self.count = counted.sum(axis=2)
+        summed = np.where(counted, errors, 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.mean = summed.sum(axis=2) / self.count
+            np.square(summed, out=summed)
+            self.rmse = np.sqrt(summed.sum(axis=2) / self.count)
+        self.percentiles: Dict[float, np.ndarray] = {}
+        if len(percentiles):
+            with warnings.catch_warnings():
+                # Deltas longer than a run have no pairs, and get NaN
+                warnings.simplefilter("ignore", RuntimeWarning)
+                values = np.nanpercentile(errors, percentiles, axis=2)
+            self.percentiles = {p: values[j] for j, p in enumerate(percentiles)}
+
+    def row(self, i: int) -> slice:
+        """ The samples of system i, without the padding """
+        return slice(0, self.lengths[i])
+
+    def delta_name(self, k: int) -> str:
+        delta = self.deltas[k]
+        if self.unit == "poses":
+            return f"{delta:g} poses"
+        return f"{delta:g} s"
+
+
+def _pose_deltas(error: np.ndarray, valid: np.ndarray, deltas: np.ndarray):
+    """ error[:, i + delta] - error[:, i] and whether both count, for every delta, as (systems, deltas, samples) """
+    samples = error.shape[1]
+    longest = int(deltas.max(initial=0))
+    padded = np.full((error.shape[0], samples + longest, error.shape[2]), np.nan)
+    padded[:, :samples] = error
+    padded_valid = np.zeros((valid.shape[0], samples + longest), dtype=bool)
+    padded_valid[:, :samples] = valid
+
+    # (systems, samples, dims, longest + 1) and (systems, samples, longest + 1) views, no copies
+    windows = np.lib.stride_tricks.sliding_window_view(padded, longest + 1, axis=1)
+    valid_windows = np.lib.stride_tricks.sliding_window_view(padded_valid, longest + 1, axis=1)
+    change = windows[..., deltas] - windows[..., :1]
+    both = valid_windows[..., deltas] & valid_windows[..., :1]
+    return np.moveaxis(change, 3, 1), np.moveaxis(both, 2, 1)
+
+
+def _time_deltas(error: np.ndarray, valid: np.ndarray, t: np.ndarray, lengths: np.ndarray, deltas: np.ndarray):
+    """ Like _pose_deltas, pairing each pose with the first pose at least delta seconds after it """
+    systems, samples = t.shape
+    # The padding takes the last time of its row, so every row is sorted. Then the rows are shifted apart so all of
+    # them can be searched at once
+    filled = np.fmax.accumulate(np.where(np.isnan(t), -np.inf, t), axis=1)
+    filled = np.maximum.accumulate(filled, axis=1)
+    finite = filled[np.isfinite(filled)]
+    first, last = (finite.min(), finite.max()) if len(finite) else (0.0, 0.0)
+    spread = last - first + deltas.max(initial=0) + 1.0
+    shifted = np.where(np.isfinite(filled), filled, first) + (np.arange(systems) * spread)[:, None]
+
+    targets = shifted[:, None, :] + deltas[None, :, None]
+    later = np.searchsorted(shifted.ravel(), targets.ravel()).reshape(targets.shape)
+    # Back to an index into the system's own row
+    later -= (np.arange(systems) * samples)[:, None, None]
+    exists = later < lengths[:, None, None]
+    later = np.minimum(later, samples - 1)
+
+    rows = np.arange(systems)[:, None, None]
+    change = error[rows, later] - error[:, None, :, :]
+    both = exists & valid[rows, later] & valid[:, None, :]
+    return change, both
+
+
+def relative_error(metrics: BatchMetrics, deltas: Sequence[float] = DEFAULT_DELTAS, unit: str = "poses",
+                   percentiles: Sequence[float] = PERCENTILES) -> RelativeError:
+    """ The RPE of every system in metrics over every delta, in poses or seconds """
+    if unit not in ("poses", "seconds"):
+        raise ValueError(f"RPE deltas are in poses or seconds, not {unit!r}")
+    if unit == "poses":
+        deltas = np.asarray(deltas, dtype=int)
+        if (deltas < 1).any():
+            raise ValueError("RPE deltas have to be at least 1 pose")
+    else:
+        deltas = np.asarray(deltas, dtype=float)
+        if (deltas <= 0).any():
+            raise ValueError("RPE deltas have to be longer than 0 seconds")
+
+    def compute():
+        with timing.phase("rpe"):
+            error = metrics.positions - metrics.ground_truth
+            if unit == "poses":
+                change, both = _pose_deltas(error, metrics.valid, deltas)
+            else:
+                change, both = _time_deltas(error, metrics.valid, metrics.t, metrics.lengths, deltas)
+            errors = np.sqrt(np.einsum("skni,skni->skn", change, change))
+            errors[~both] = np.nan
+            return {"errors": errors}
+
+    # From the derived cache if we've worked it out for the same metrics before (see derived.py)
+    errors = metrics.cached("rpe", {"deltas": deltas.tolist(), "unit": unit}, compute)["errors"]
+    return RelativeError(metrics.names, metrics.lengths, deltas, unit, metrics.t, errors, percentiles)
+
+
+if __name__ == "__main__":
+    from scripts.reusable_code import metrics as metrics_module
+    from scripts.reusable_code.datasets import DATASETS
+
+    for dataset in DATASETS:
+        dataset.preload()
+        rpe = relative_error(metrics_module.for_dataset(dataset))
+        print(dataset.name)
+        for k in range(len(rpe.deltas)):
+            print(f"  RPE over {rpe.delta_name(k)}:  mean / RMSE / " + " / ".join(f"p{p}" for p in rpe.percentiles))
+            for i, name in enumerate(rpe.names):
+                stats = [rpe.mean[i, k], rpe.rmse[i, k]] + [values[i, k] for values in rpe.percentiles.values()]
+                print(f"    {name:<20}" + "  ".join(f"{value:8.3f}" for value in stats))
@@ -0,0 +1,205 @@
+# Runs the plot scripts for ./build.py with a bounded number of workers
+#
+# Every script imports matplotlib + pandas and starts its own LaTeX, so starting them all at once
+# oversubscribes CPU and RAM. Instead we run at most `workers` at a time, and only start a script if its
+# peak memory (from earlier builds) fits in the memory budget.
+#
+# Jobs are started longest-first using the durations recorded on earlier builds, so the slowest plot
+# (figures/path.py) doesn't get started last and hold up the whole build.
+
+import json
+import os
+import subprocess
+import time
+from typing import Callable, Dict, List, Tuple
+
+HISTORY_PATH = ".build/history.json"
+
+# Used for scripts we haven't seen before
+DEFAULT_JOB_MEMORY = 400 * 1024 * 1024
+
+
+class Job:
+    """ Struct class for one script we want to run """
+    def __init__(self, script_path: str, module: str, data=None):
+        self.script_path = script_path
+        self.module = module
+        # Anything the caller wants back when the job finishes
+        self.data = data
+
+        # Filled in by the scheduler
+        self.pid: int | None = None
+        self.returncode: int | None = None
+        self.duration: float | None = None
+        self.max_rss: int | None = None
+
+
+class History:
+    """ Per-script duration and peak memory from earlier builds """
+    def __init__(self, path: str = HISTORY_PATH):
+        self.path = path
+        # module -> {"duration": seconds, "max_rss": bytes}
+        self.scripts: Dict[str, dict] = {}
+        if os.path.isfile(path):
+            try:
+                with open(path) as f:
+                    self.scripts = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+    def duration(self, module: str) -> float | None:
+        return self.scripts.get(module, {}).get("duration")
+
+    def memory(self, module: str) -> int:
+        return self.scripts.get(module, {}).get("max_rss") or DEFAULT_JOB_MEMORY
+
+    def record(self, job: Job):
+        entry = self.scripts.setdefault(job.module, {})
+        entry["duration"] = job.duration
+        if job.max_rss:
+            entry["max_rss"] = job.max_rss
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.scripts, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+def available_memory() -> int | None:
+    """ MemAvailable from /proc/meminfo in bytes, or None if we can't tell (e.g. not on linux) """
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class SubprocessRunner:
+    """ Runs each job as `python3 -m module` """
+    def __init__(self):
+        self.running: Dict[int, Tuple[Job, subprocess.Popen, float]] = {}
+
+    def start(self, job: Job):
+        p = subprocess.Popen(["python3", "-m", job.module])
+        self.running[p.pid] = (job, p, time.monotonic())
+
+    def cancel(self, job: Job):
+        for pid, (running_job, p, start) in self.running.items():
+            if running_job is job:
+                p.kill()
+
+    def wait(self, timeout: float | None = None) -> Job | None:
+        """ Blocks until any running job finishes and returns it, or returns None after `timeout` seconds """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            finished = self._reap()
+            if finished is not None:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(0.02)
+
+        pid, status, rusage = finished
+        job, p, start = self.running.pop(pid)
+        p.returncode = os.waitstatus_to_exitcode(status)
+
+        job.pid = pid
+        job.returncode = p.returncode
+        job.duration = time.monotonic() - start
+        # ru_maxrss is in KiB on linux
+        job.max_rss = rusage.ru_maxrss * 1024
+        return job
+
+    def _reap(self):
+        """ (pid, status, rusage) of a job that has finished, or None if they're all still running """
+        # Only our jobs, not os.wait4(-1): build.py has other children (the LaTeX daemon) that it waits for itself.
+        # os.wait4 gives us the peak memory of the child, which Popen.wait doesn't
+        for pid in self.running:
+            finished = os.wait4(pid, os.WNOHANG)
+            if finished[0] != 0:
+                return finished
+        return None
+
+    def close(self):
+        pass
+
+
+def order_jobs(jobs: List[Job], history: History) -> List[Job]:
+    """ Longest job first. Jobs we've never timed go first, so we learn how long they take """
+    return sorted(jobs, key=lambda job: -(history.duration(job.module) or float("inf")))
+
+
+class Scheduler:
+    """ Runs jobs at most `workers` at a time and within `memory_budget` bytes, longest first """
+    def __init__(self, runner, history: History, workers: int | None = None, memory_budget: int | None = None,
+                 on_finish: Callable[[Job], None] | None = None):
+        self.runner = runner
+        self.history = history
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.memory_budget = memory_budget
+        self.on_finish = on_finish
+
+        self.pending: List[Job] = []
+        # job -> expected memory
+        self.running: Dict[Job, int] = {}
+
+    def busy(self) -> bool:
+        return bool(self.pending or self.running)
+
+    def submit(self, job: Job):
+        self.pending = order_jobs(self.pending + [job], self.history)
+
+    def cancel(self, module: str) -> bool:
+        """ Drops a pending job, or kills a running one. Returns True if a running job was killed """
+        self.pending = [job for job in self.pending if job.module != module]
+        killed = False
+        for job in self.running:
+            if job.module == module:
+                self.runner.cancel(job)
+                killed = True
+        return killed
+
+    def is_running(self, module: str) -> bool:
+        return any(job.module == module for job in self.running)
+
+    def step(self, timeout: float | None = None):
+        """ Starts as many jobs as fit, then waits up to `timeout` seconds for one to finish """
+        # If the next longest job doesn't fit in memory, try a smaller one
+        for job in list(self.pending):
+            if len(self.running) >= self.workers:
+                break
+            memory = self.history.memory(job.module)
+            # Always let one job run, even if it's bigger than the whole budget
+            if self.running and self.memory_budget is not None \
+                    and sum(self.running.values()) + memory > self.memory_budget:
+                continue
+            self.pending.remove(job)
+            self.runner.start(job)
+            self.running[job] = memory
+
+        if not self.running:
+            return
+        job = self.runner.wait(timeout)
+        if job is None:
+            return
+        self.running.pop(job)
+        # Killed jobs didn't run long enough to tell us anything
+        if job.returncode >= 0:
+            self.history.record(job)
+        if self.on_finish is not None:
+            self.on_finish(job)
+
+
+def run_jobs(jobs: List[Job], runner, history: History, workers: int | None = None,
+             memory_budget: int | None = None, on_finish: Callable[[Job], None] | None = None):
+    """ Runs every job, at most `workers` at a time and within `memory_budget` bytes """
+    scheduler = Scheduler(runner, history, workers, memory_budget, on_finish)
+    for job in jobs:
+        scheduler.submit(job)
+    while scheduler.busy():
+        scheduler.step()
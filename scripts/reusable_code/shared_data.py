@@ -0,0 +1,136 @@
+# Trajectories decoded once by ./build.py and shared with every plot script through shared memory
+#
+# Every script loads the same .npz files, and every np.load decompresses them again in its own process.
+# Instead, build.py decodes each .npz once into a multiprocessing.shared_memory block, and writes an index of
+# the blocks to the file named by PLOT_SHARED_DATA. load_trajectory() (loader.py) then maps the block
+# read-only, so no matter how many scripts use a trajectory there is only one copy of it in RAM.
+#
+# The index records the mtime and size of each .npz, so if the file changes after build.py published it the
+# scripts notice and load the file themselves.
+
+import json
+import os
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+SHARED_DATA_ENV = "PLOT_SHARED_DATA"
+
+
+def _stat(path: str) -> list:
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _open_block(name: str) -> shared_memory.SharedMemory:
+    """ Attaches to a block without taking ownership of it """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before python 3.13 attaching registers the block with the resource tracker, which would unlink it when
+        # this process exits and break every other script using it. See https://github.com/python/cpython/issues/82300
+        from multiprocessing import resource_tracker
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedTrajectories:
+    """ The build.py side: owns the shared memory blocks, and unlinks them in close() """
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        # path -> {"stat": [mtime, size], "arrays": {key: {"name": ..., "shape": ..., "dtype": ...}}}
+        self.index: Dict[str, dict] = {}
+        self.blocks: Dict[str, list] = {}
+
+    def publish(self, paths: Iterable[str]):
+        """ Decodes any of the .npz files that aren't shared yet (or have changed) into shared memory """
+        changed = False
+        for path in map(os.path.normpath, paths):
+            try:
+                stat = _stat(path)
+            except FileNotFoundError:
+                continue
+            if path in self.index and self.index[path]["stat"] == stat:
+                continue
+
+            self._unlink(path)
+            arrays = {}
+            blocks = []
+            with np.load(path) as npz:
+                for key in npz.files:
+                    array = npz[key]
+                    block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+                    np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+                    blocks.append(block)
+                    arrays[key] = {"name": block.name, "shape": list(array.shape), "dtype": array.dtype.str}
+            self.index[path] = {"stat": stat, "arrays": arrays}
+            self.blocks[path] = blocks
+            changed = True
+
+        if changed:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            with open(self.index_path + ".tmp", "w") as f:
+                json.dump(self.index, f)
+            os.replace(self.index_path + ".tmp", self.index_path)
+
+    def _unlink(self, path: str):
+        # Scripts that already mapped the old block keep it until they exit
+        for block in self.blocks.pop(path, []):
+            block.close()
+            block.unlink()
+        self.index.pop(path, None)
+
+    def close(self):
+        for path in list(self.blocks):
+            self._unlink(path)
+        if os.path.isfile(self.index_path):
+            os.remove(self.index_path)
+
+
+# ------------------------------------------------
+# The plot script side
+
+# (path, key) -> array we have already mapped
+_attached: Dict[Tuple[str, str], np.ndarray] = {}
+# The arrays don't keep their blocks open by themselves
+_blocks: List[shared_memory.SharedMemory] = []
+
+
+def _read_index() -> Dict[str, dict]:
+    index_path = os.environ.get(SHARED_DATA_ENV)
+    if not index_path:
+        return {}
+    try:
+        with open(index_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def attach(path: str, key: str = "data") -> np.ndarray | None:
+    """ A read-only, zero-copy view of an array build.py shared, or None if it isn't shared """
+    if (path, key) in _attached:
+        return _attached[(path, key)]
+
+    entry = _read_index().get(os.path.normpath(path))
+    if entry is None or key not in entry["arrays"]:
+        return None
+    try:
+        if entry["stat"] != _stat(path):
+            # The file changed since build.py shared it
+            return None
+        info = entry["arrays"][key]
+        block = _open_block(info["name"])
+    except (FileNotFoundError, OSError):
+        return None
+
+    array = np.ndarray(tuple(info["shape"]), np.dtype(info["dtype"]), buffer=block.buf)
+    array.flags.writeable = False
+    _attached[(path, key)] = array
+    _blocks.append(block)
+    return array
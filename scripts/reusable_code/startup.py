@@ -0,0 +1,90 @@
+# How long importing each plot script takes, and whether it fits in a budget
+#
+# Importing a script should only define its settings and functions. matplotlib, pandas and the like are imported
+# inside the functions that draw (see style.py and export.py), so a composite figure like bars2.py can import
+# performance.py and power.py, and tables.py and the metrics CLIs never load matplotlib at all. One top-level
+# `import matplotlib.pyplot` puts all of that back, without any error, so this catches it.
+#
+# Each script is imported in a fresh interpreter with `python -X importtime`, which prints the time every module took
+# to import, including everything it imported. The script's own line is its import time. The fastest of a few runs is
+# taken, so a busy machine doesn't fail the check.
+#
+#     python3 -m scripts.reusable_code.startup                # exits with 1 if any script is over its budget
+#     python3 -m scripts.reusable_code.startup --budget 150   # a tighter budget, in milliseconds
+
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List
+
+SCRIPTS_DIR = "scripts"
+# Not scripts, like in build.py
+EXCLUDE = {"reusable_code"}
+
+# Milliseconds. Enough for numpy and our own modules, not for matplotlib
+BUDGET_MS = 300.0
+# Scripts that are allowed longer
+BUDGETS_MS: Dict[str, float] = {}
+
+REPEAT = 3
+
+# "import time:       self [us] | cumulative | imported package", with the package indented by how deep it was imported
+IMPORTTIME_LINE = re.compile(r"^import time:\s+\d+\s+\|\s+(\d+)\s+\|\s?(\s*)(\S+)\s*$")
+
+
+def find_scripts(scripts_dir: str = SCRIPTS_DIR) -> List[str]:
+    """ Every script build.py would run """
+    scripts = []
+    for root, dirs, files in os.walk(scripts_dir):
+        dirs[:] = [d for d in dirs if d not in EXCLUDE]
+        scripts += [os.path.join(root, file) for file in files if file.endswith(".py") and not file.startswith("__")]
+    return sorted(scripts)
+
+
+def import_time(module: str) -> float:
+    """ Seconds it takes a fresh interpreter to import module, and everything it imports """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Couldn't import {module}:\n{result.stderr.strip().splitlines()[-1]}")
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        # The top-level line, not the same name imported by something else
+        if match and not match.group(2) and match.group(3) == module:
+            return int(match.group(1)) / 1e6
+    raise RuntimeError(f"python -X importtime didn't report {module}")
+
+
+def check(scripts: List[str], budget_ms: float = BUDGET_MS, repeat: int = REPEAT) -> List[str]:
+    """ Prints the import time of every script, and returns the ones over their budget """
+    over = []
+    for script in scripts:
+        module = script.removesuffix(".py").replace(os.sep, ".")
+        budget = BUDGETS_MS.get(script, budget_ms)
+        try:
+            ms = 1000 * min(import_time(module) for _ in range(repeat))
+        except RuntimeError as e:
+            print(f"{script:<36}      failed  {e}")
+            over.append(script)
+            continue
+        verdict = "ok" if ms <= budget else "OVER BUDGET"
+        print(f"{script:<36}{ms:8.0f} ms  (budget {budget:.0f} ms)  {verdict}")
+        if ms > budget:
+            over.append(script)
+    return over
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check that importing every plot script stays under a time budget")
+    parser.add_argument("scripts", nargs="*", help="the scripts to check, by default every script build.py runs")
+    parser.add_argument("--budget", type=float, default=BUDGET_MS, help="milliseconds each script may take to import")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="imports of each script, the fastest is used")
+    args = parser.parse_args()
+
+    over = check(args.scripts or find_scripts(), args.budget, args.repeat)
+    if over:
+        print(f"{len(over)} over budget: {', '.join(over)}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,44 @@
+# The matplotlib setup every plot uses, so the .pgf output matches our LaTeX document
+#
+# matplotlib is only imported once a script configures it, so importing this is free
+
+from scripts.reusable_code import text_metrics
+
+# Make the graph export to .pgf, to be used by LaTeX
+PGF_RCPARAMS = {
+    "pgf.texsystem": "pdflatex",
+    'font.family': 'serif',
+    'text.usetex': True,
+    'pgf.rcfonts': False,
+    "savefig.transparent": True,
+    "savefig.dpi": 300,
+    # prevent rasterization
+}
+
+# So calling configure() more than once (e.g. from bars2.py and the modules it draws with) only sets things up once
+_configured_backend: str | None = None
+
+
+def use_pgf():
+    global _configured_backend
+    if _configured_backend == "pgf":
+        return
+    import matplotlib
+
+    matplotlib.rcParams.update(PGF_RCPARAMS)
+    matplotlib.use("pgf")
+    # Reuse LaTeX text sizes from earlier builds
+    text_metrics.install()
+    _configured_backend = "pgf"
+
+
+def configure(interactive: bool):
+    """ Export to .pgf, or open a window to preview the graph if interactive """
+    global _configured_backend
+    if not interactive:
+        use_pgf()
+    else:
+        import matplotlib
+
+        matplotlib.use("TkAgg")
+        _configured_backend = "TkAgg"
@@ -0,0 +1,36 @@
+# The SLAM systems (and the GPS) we have trajectories for, and how to show them in the plots
+#
+# Each dataset directory has one <file>.npz per system. Add new systems here!
+
+from typing import Dict, List
+
+
+class System:
+    """ Struct class for one source of trajectories """
+    def __init__(self, file: str, name: str, mode: str, color: str):
+        # The name of the .npz in each dataset directory, without .npz
+        self.file = file
+        # For legends and tables
+        self.name = name
+        # The sensors it uses: "RGBD", "Mono", "Lidar" or "GPS"
+        self.mode = mode
+        self.color = color
+
+
+SYSTEMS: List[System] = [
+    System("gps_ground_truth", "RTK GPS", "GPS", "black"),
+    System("rtabmap_slam_traj", "RTAB-Map", "Lidar", "C0"),
+    System("orb_slam3_traj", "ORB-SLAM3 (RGBD)", "RGBD", "C1"),
+    System("droid_slam_traj", "DROID-SLAM (RGBD)", "RGBD", "C2"),
+    System("orb_slam3_mono_traj", "ORB-SLAM3 (Mono)", "Mono", "C3"),
+    System("droid_slam_mono_traj", "DROID-SLAM (Mono)", "Mono", "C4"),
+    System("mast3r_slam_traj", "MAST3R-SLAM", "Mono", "C5"),
+    System("anyfeature_slam_traj", "AnyFeature-VSLAM", "Mono", "C6"),
+]
+
+BY_FILE: Dict[str, System] = {system.file: system for system in SYSTEMS}
+
+
+def system_for(file: str) -> System:
+    """ The system a trajectory file belongs to. Files we don't know about get a placeholder """
+    return BY_FILE.get(file, System(file, file, "", "gray"))
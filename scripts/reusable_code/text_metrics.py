@@ -0,0 +1,219 @@
+# A persistent cache of LaTeX text sizes, shared by every plot script and every build
+#
+# With the pgf backend, matplotlib asks a LaTeX subprocess for the width, height and descent of every label,
+# legend entry and tick label, so that fig.tight_layout() and savefig() can lay the figure out. Each script starts
+# its own LaTeX and measures the same strings again on every build.
+#
+# install() (called by style.use_pgf()) makes the pgf backend look the sizes up in .build/text_metrics.sqlite
+# first. The key is the exact TeX matplotlib would send (the string, wrapped in its font and size commands) and
+# the LaTeX header (document class, texsystem and preamble), so changing the preamble never reuses old sizes.
+# The least recently used sizes are evicted once there are more than MAX_ENTRIES.
+#
+# Misses are measured by a long-lived LaTeX daemon if ./build.py --latex-daemon started one, otherwise by
+# matplotlib's own LaTeX process like before.
+
+import atexit
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, Set, Tuple
+
+CACHE_PATH = ".build/text_metrics.sqlite"
+MAX_ENTRIES = 100_000
+DAEMON_ENV = "PLOT_LATEX_DAEMON"
+
+Metrics = Tuple[float, float, float]
+
+
+class MetricsCache:
+    """ Text sizes on disk, keyed by sha256 of the LaTeX header and the TeX for the text """
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.connection: sqlite3.Connection | None = None
+        # What we looked up or measured in this process, written back in flush()
+        self.memory: Dict[str, Metrics] = {}
+        self.new: Dict[str, Metrics] = {}
+        self.used: Set[str] = set()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened lazily, so the render server never forks an open connection
+        if self.connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.connection = sqlite3.connect(self.path, timeout=30)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS metrics "
+                "(key TEXT PRIMARY KEY, width REAL, height REAL, descent REAL, last_used REAL)")
+        return self.connection
+
+    def get(self, key: str) -> Metrics | None:
+        if key in self.memory:
+            return self.memory[key]
+        try:
+            row = self._connect().execute(
+                "SELECT width, height, descent FROM metrics WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            row = None
+        if row is None:
+            return None
+        self.memory[key] = row
+        self.used.add(key)
+        return row
+
+    def put(self, key: str, metrics: Metrics):
+        self.memory[key] = metrics
+        self.new[key] = metrics
+
+    def flush(self):
+        """ Saves new sizes, marks the ones we used as recently used, and evicts the oldest """
+        if not self.new and not self.used:
+            return
+        now = time.time()
+        try:
+            with self._connect() as connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO metrics VALUES (?, ?, ?, ?, ?)",
+                    [(key, *metrics, now) for key, metrics in self.new.items()])
+                connection.executemany(
+                    "UPDATE metrics SET last_used = ? WHERE key = ?", [(now, key) for key in self.used])
+                count, = connection.execute("SELECT COUNT(*) FROM metrics").fetchone()
+                if count > self.max_entries:
+                    connection.execute(
+                        "DELETE FROM metrics WHERE key IN "
+                        "(SELECT key FROM metrics ORDER BY last_used ASC LIMIT ?)", (count - self.max_entries,))
+        except sqlite3.Error as e:
+            # Losing the cache only makes the next build slower
+            print(f"Couldn't save LaTeX text sizes to {self.path}: {e}", file=sys.stderr)
+        self.new.clear()
+        self.used.clear()
+
+
+_cache = MetricsCache()
+atexit.register(_cache.flush)
+
+
+def cache_key(header: str, tex: str) -> str:
+    return hashlib.sha256(f"{header}\0{tex}".encode()).hexdigest()
+
+
+# ------------------------------------------------
+# Talking to the LaTeX daemon
+
+_daemon: socket.socket | None = None
+_daemon_file = None
+_daemon_failed = False
+
+
+def _measure_with_daemon(header: str, tex: str) -> Metrics | None:
+    """ Asks the daemon to measure the text, or returns None if there is no daemon or it can't """
+    global _daemon, _daemon_file, _daemon_failed
+    path = os.environ.get(DAEMON_ENV)
+    if not path or _daemon_failed:
+        return None
+    try:
+        if _daemon is None:
+            _daemon = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            _daemon.connect(path)
+            _daemon_file = _daemon.makefile("rw")
+        _daemon_file.write(json.dumps({"header": hashlib.sha256(header.encode()).hexdigest(), "tex": tex}) + "\n")
+        _daemon_file.flush()
+        reply = json.loads(_daemon_file.readline())
+    except (OSError, ValueError):
+        # Don't keep trying a daemon that isn't there
+        _daemon_failed = True
+        return None
+    if "metrics" not in reply:
+        return None
+    return tuple(reply["metrics"])
+
+
+def serve_daemon(socket_path: str):
+    """ Measures text for any number of plot scripts with a single LaTeX process """
+    import socketserver
+    from matplotlib.backends.backend_pgf import LatexManager
+    from scripts.reusable_code import style
+
+    style.use_pgf()
+    header = LatexManager._build_latex_header()
+    header_sha = hashlib.sha256(header.encode()).hexdigest()
+    manager = LatexManager._get_cached_or_new()
+    # LatexManager talks to one LaTeX process, so measure one text at a time
+    lock = threading.Lock()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                request = json.loads(line)
+                if request["header"] != header_sha:
+                    # The script has a different preamble to us, it will have to measure the text itself
+                    reply = {"error": "header mismatch"}
+                else:
+                    try:
+                        with lock:
+                            reply = {"metrics": manager._get_box_metrics(request["tex"])}
+                    except ValueError as e:
+                        reply = {"error": str(e)}
+                self.wfile.write((json.dumps(reply) + "\n").encode())
+                self.wfile.flush()
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as server:
+        server.daemon_threads = True
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    os.remove(socket_path)
+
+
+# ------------------------------------------------
+# Hooking into the pgf backend
+
+_installed = False
+
+
+def install():
+    """ Makes the pgf backend use the cache. Safe to call more than once """
+    global _installed
+    if _installed:
+        return
+    from matplotlib.backends import backend_pgf
+    # These are private to matplotlib. If they move, just keep the normal behaviour
+    if not all(hasattr(backend_pgf, name) for name in ("_escape_and_apply_props", "mpl_pt_to_in", "LatexManager")):
+        return
+    LatexManager = backend_pgf.LatexManager
+
+    def get_text_width_height_descent(self, s, prop, ismath):
+        header = LatexManager._build_latex_header()
+        tex = backend_pgf._escape_and_apply_props(s, prop)
+        key = cache_key(header, tex)
+
+        metrics = _cache.get(key)
+        if metrics is None:
+            metrics = _measure_with_daemon(header, tex)
+            if metrics is None:
+                metrics = LatexManager._get_cached_or_new().get_width_height_descent(s, prop)
+            _cache.put(key, metrics)
+
+        # Same as RendererPgf.get_text_width_height_descent: latex pt to display units
+        w, h, d = metrics
+        f = backend_pgf.mpl_pt_to_in * self.dpi
+        return w * f, h * f, d * f
+
+    backend_pgf.RendererPgf.get_text_width_height_descent = get_text_width_height_descent
+    _installed = True
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--daemon":
+        serve_daemon(sys.argv[2])
+    else:
+        print(f"usage: python3 -m {__spec__.name} --daemon SOCKET_PATH", file=sys.stderr)
+        sys.exit(2)
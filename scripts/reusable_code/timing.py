@@ -0,0 +1,163 @@
+# Records how long each phase of a plot script takes (loading data, maths, layout, saving...)
+#
+# Wrap a phase with:
+#
+#     with timing.phase("tight_layout"):
+#         fig.tight_layout()
+#
+# When ./build.py runs a script it sets PLOT_TRACE_DIR, and the phases (and the plot files the script wrote, see
+# record_output()) are written to <PLOT_TRACE_DIR>/<pid>.json when the script exits. build.py collects them into
+# one Chrome trace per build (open it in chrome://tracing or https://ui.perfetto.dev) and prints how each phase
+# compares to the previous build.
+# Outside of build.py this does nothing but call time.perf_counter().
+
+import atexit
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+TRACE_DIR_ENV = "PLOT_TRACE_DIR"
+
+# Chrome trace "complete" events, see https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+_events: List[dict] = []
+# Files the script saved, so build.py knows what to check next time
+_outputs: List[str] = []
+
+
+@contextmanager
+def phase(name: str):
+    start_us = time.time_ns() // 1000
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _events.append({
+            "name": name,
+            "ph": "X",
+            "ts": start_us,
+            "dur": (time.perf_counter() - start) * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        })
+
+
+def record_output(path: str):
+    _outputs.append(path)
+
+
+def flush():
+    """ Writes the phases recorded so far for build.py. Called automatically at exit """
+    trace_dir = os.environ.get(TRACE_DIR_ENV)
+    if not trace_dir or not (_events or _outputs):
+        return
+    os.makedirs(trace_dir, exist_ok=True)
+    path = os.path.join(trace_dir, f"{os.getpid()}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump({"events": _events, "outputs": _outputs}, f)
+    os.replace(path + ".tmp", path)
+
+
+atexit.register(flush)
+
+
+def read_report(trace_dir: str, pid: int) -> dict:
+    """ The phases and outputs a script run by build.py recorded """
+    try:
+        with open(os.path.join(trace_dir, f"{pid}.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"events": [], "outputs": []}
+
+
+def phase_totals(events: List[dict]) -> Dict[str, float]:
+    """ Total seconds spent in each phase, in the order the phases first happened """
+    totals: Dict[str, float] = {}
+    for event in events:
+        if event.get("ph") == "X":
+            totals[event["name"]] = totals.get(event["name"], 0) + event["dur"] / 1e6
+    return totals
+
+
+# ------------------------------------------------
+# The build.py side
+
+TIMINGS_PATH = ".build/timings.json"
+TRACES_DIR = ".build/traces"
+# How many old traces to keep around
+KEEP_TRACES = 20
+
+
+class BuildTrace:
+    """ Collects the phases of every script in a build into one Chrome trace, and compares them with the last build """
+    def __init__(self, trace_dir: str):
+        self.name = time.strftime("%Y%m%d-%H%M%S") + f"-{time.time_ns() // 1000000 % 1000:03d}"
+        # Where the scripts write their phases while the build is running (PLOT_TRACE_DIR)
+        self.trace_dir = trace_dir
+        self.events: List[dict] = []
+        # module -> phase -> seconds
+        self.totals: Dict[str, Dict[str, float]] = {}
+
+    def add_job(self, job) -> List[str]:
+        """ Adds a finished job to the trace, and returns the plot files it wrote """
+        report = read_report(self.trace_dir, job.pid)
+        events = report["events"]
+        end_us = max((e["ts"] + e["dur"] for e in events), default=time.time_ns() // 1000)
+        # Name the process after the script, and draw the whole run of the script above its phases
+        self.events.append({"name": "process_name", "ph": "M", "pid": job.pid, "args": {"name": job.module}})
+        self.events.append({"name": job.module, "ph": "X", "ts": end_us - job.duration * 1e6, "dur": job.duration * 1e6,
+                            "pid": job.pid, "tid": 0, "args": {"returncode": job.returncode}})
+        self.events.extend(events)
+
+        totals = phase_totals(events)
+        totals["total"] = job.duration
+        self.totals[job.module] = totals
+        return report["outputs"]
+
+    def save(self):
+        """ Writes the trace for this build and prints each phase next to the previous build """
+        if not self.totals:
+            return
+        os.makedirs(TRACES_DIR, exist_ok=True)
+        trace_path = os.path.join(TRACES_DIR, f"{self.name}.json")
+        with open(trace_path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+
+        shutil.rmtree(self.trace_dir, ignore_errors=True)
+        traces = sorted(f for f in os.listdir(TRACES_DIR) if f.endswith(".json"))
+        for old in traces[:-KEEP_TRACES]:
+            os.remove(os.path.join(TRACES_DIR, old))
+
+        previous: Dict[str, Dict[str, float]] = {}
+        if os.path.isfile(TIMINGS_PATH):
+            try:
+                with open(TIMINGS_PATH) as f:
+                    previous = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+        self.print_summary(previous)
+        print(f"Trace written to {trace_path}")
+
+        # Scripts that were skipped keep their timings from the build they last ran in
+        with open(TIMINGS_PATH, "w") as f:
+            json.dump({**previous, **self.totals}, f, indent=1, sort_keys=True)
+
+    def print_summary(self, previous: Dict[str, Dict[str, float]]):
+        print(f"\n{'Phase timings':<40}{'this run':>10}{'last run':>10}{'change':>10}")
+        for module in sorted(self.totals, key=lambda m: -self.totals[m]["total"]):
+            print(f"  {module}")
+            before = previous.get(module, {})
+            for name, seconds in self.totals[module].items():
+                last = before.get(name)
+                if last is None:
+                    change = "new"
+                    last = ""
+                else:
+                    change = f"{(seconds - last) / last * 100:+.0f}%" if last > 0 else ""
+                    last = f"{last:.3f}s"
+                print(f"    {name:<36}{seconds:>9.3f}s{last:>10}{change:>10}")
+        print()
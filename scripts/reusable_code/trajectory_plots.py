@@ -0,0 +1,127 @@
+# The pieces of the trajectory figures (scripts/figures/path.py, lidar.py and rmse.py)
+#
+# An OdomPlot draws one system's trajectory, an RmsePlot draws its error against the GPS over time, and an RpePlot
+# draws its relative error over a fixed delta (see rpe.py). The errors of all the systems are computed together by
+# metrics.py, which matches the poses with the GPS by their timestamps (see association.py), so systems that dropped
+# frames or ran at a different rate are still compared with where the GPS was at the same time.
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from scripts.reusable_code.metrics import BatchMetrics
+from scripts.reusable_code.rpe import RelativeError
+
+# Only for the annotations. The plots are drawn on an ax the script made, so importing this doesn't need matplotlib
+if TYPE_CHECKING:
+    from matplotlib.lines import Line2D
+
+
+class RmsePlot:
+    """ Struct class to store everything we need for a single RMS error plot """
+    def __init__(self, metrics: BatchMetrics, i: int, name: str, color, linestyle1: str | None = "solid", linestyle2: str | None = "dashed", lw: float | None = 1):
+        self.name = name
+        self.color = color
+        self.linestyle1 = linestyle1
+        self.linestyle2 = linestyle2
+        self.lw = lw
+
+        # Views of system i's row of the metrics (see metrics.py). Poses without a GPS sample are NaN
+        row = metrics.row(i)
+        self.t = metrics.t[i, row]
+        self.valid = metrics.valid[i, row]
+        self.sqdist = metrics.sqdist[i, row]
+        self.dist = metrics.dist[i, row]
+        # overall RMSE
+        self.rmse = metrics.rmse[i]
+        # cumulative RMSE over time, of the poses matched so far
+        self.cumulative_rmse = metrics.cumulative_rmse[i, row]
+        self.metrics = metrics
+        self.i = i
+
+        # The future result of self.plot
+        self.plt1: Line2D | None = None
+        self.plt2: Line2D | None = None
+
+    def plot_cumulative_rmse(self, ax) -> Line2D:
+        if self.plt1 is None:
+            self.plt1, = ax.plot(self.t, self.cumulative_rmse, c=self.color, linestyle=self.linestyle1, lw=1.5)
+        return self.plt1
+
+    def rolling_rmse(self, windows) -> np.ndarray:
+        """ The RMSE over the last window poses, for each of the windows, as a (windows, samples) array """
+        return self.metrics.rolling_rmse(windows)[self.i, :, self.metrics.row(self.i)]
+
+    def plot_rolling_rmse(self, ax, window: int, linestyle: str | None = "dotted") -> Line2D:
+        plt, = ax.plot(self.t, self.rolling_rmse([window])[0], c=self.color, linestyle=linestyle, lw=1)
+        return plt
+
+    def plot_distance(self, ax) -> Line2D:
+        if self.plt2 is None:
+            self.plt2, = ax.plot(self.t, self.dist, c=self.color, linestyle=self.linestyle2, alpha=0.5, lw=0.8)
+        return self.plt2
+
+    def legend_name_distance(self) -> str:
+        return self.name + " Distance to GPS"
+
+    def legend_name_error(self) -> str:
+        return self.name + " Cumulative RMS error"
+
+
+class RpePlot:
+    """ Struct class to store everything we need for a single relative pose error plot """
+    def __init__(self, rpe: RelativeError, i: int, k: int, name: str, color, linestyle: str | None = "solid", lw: float | None = 0.8):
+        self.name = name
+        self.color = color
+        self.linestyle = linestyle
+        self.lw = lw
+        self.delta_name = rpe.delta_name(k)
+
+        # Views of system i's RPE over delta k, against the time of the first pose of each pair
+        row = rpe.row(i)
+        self.t = rpe.t[i, row]
+        self.errors = rpe.errors[i, k, row]
+        self.mean = rpe.mean[i, k]
+        self.rmse = rpe.rmse[i, k]
+
+        # The future result of self.plot
+        self.plt: Line2D | None = None
+
+    def plot(self, ax) -> Line2D:
+        if self.plt is None:
+            self.plt, = ax.plot(self.t, self.errors, c=self.color, linestyle=self.linestyle, alpha=0.8, lw=self.lw)
+        return self.plt
+
+    def legend_name(self) -> str:
+        return self.name + " RPE over " + self.delta_name
+
+
+class OdomPlot:
+    """ Struct class to store everything we need for a single odom plot """
+    def __init__(self, name: str, raw_data, color, linestyle: str | None = "solid", lw: float | None = 0.65, zorder: float = 10):
+        self.name = name
+        self.color = color
+        self.linestyle = linestyle
+        self.x = raw_data[:,0]
+        self.y = raw_data[:,1]
+        self.lw = lw
+        self.zorder = zorder
+
+        # The future result of self.plot
+        self.plt: Line2D | None = None
+        self.plt_endpoint: Line2D | None = None
+
+    def plot(self, ax) -> Line2D:
+        if self.plt is None:
+            self.plt, = ax.plot(self.x, self.y, c=self.color, linestyle=self.linestyle, lw=self.lw, zorder=self.zorder)
+        return self.plt
+
+    def plot_endpoint(self, ax) -> Line2D:
+        if self.plt_endpoint is None:
+            self.plt_endpoint = ax.scatter([self.x[len(self.x) - 1]], [self.y[len(self.y) - 1]], c=self.color,  marker="X", lw=self.lw/2, zorder=100)
+        return self.plt_endpoint
+
+    def legend_name(self) -> str:
+        return self.name + " Trajectory"
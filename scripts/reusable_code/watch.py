@@ -0,0 +1,86 @@
+# ./build.py --watch: re-render only the plots affected by a file you just saved
+#
+# We poll scripts/ and every dataset directory for changed mtimes or sizes. An editor save is often a burst of
+# writes, so we wait until nothing has changed for DEBOUNCE seconds before doing anything.
+# If a plot is still rendering when one of its inputs changes again, that render is killed and started again.
+
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+from scripts.reusable_code.datasets import DATA_DIRS
+from scripts.reusable_code.manifest import find_dependencies
+
+WATCH_DIRS = ["scripts"] + DATA_DIRS
+
+# How often to look for changes, in seconds
+POLL_INTERVAL = 0.2
+# How long the files have to stay unchanged before we rebuild, in seconds
+DEBOUNCE = 0.3
+
+
+def snapshot(dirs: Iterable[str] = WATCH_DIRS) -> Dict[str, Tuple[int, int]]:
+    """ path -> (mtime, size) for every file we watch """
+    files = {}
+    for watch_dir in dirs:
+        for root, subdirs, names in os.walk(watch_dir):
+            subdirs[:] = [d for d in subdirs if d != "__pycache__"]
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files[path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+def changed_files(before: Dict[str, Tuple[int, int]], after: Dict[str, Tuple[int, int]]) -> Set[str]:
+    return {path for path in before.keys() | after.keys() if before.get(path) != after.get(path)}
+
+
+def affected_scripts(scripts: List[str], changed: Set[str]) -> List[str]:
+    """ The scripts that depend on any of the changed files """
+    affected = []
+    for script in scripts:
+        try:
+            dependencies = find_dependencies(script)
+        except (OSError, SyntaxError):
+            # Half-saved script, it will change again soon
+            dependencies = [script]
+        if changed.intersection(dependencies):
+            affected.append(script)
+    return affected
+
+
+class Watcher:
+    """ Polls for changes, and calls rebuild() with the scripts to re-render once the changes settle """
+    def __init__(self, find_scripts: Callable[[], List[str]], rebuild: Callable[[List[str]], None]):
+        self.find_scripts = find_scripts
+        self.rebuild = rebuild
+        self.files = snapshot()
+
+    def poll(self):
+        """ Checks for changes once. Call this every POLL_INTERVAL seconds """
+        current = snapshot()
+        changed = changed_files(self.files, current)
+        if not changed:
+            return
+
+        # Wait for a burst of saves to finish
+        while True:
+            time.sleep(DEBOUNCE)
+            settled = snapshot()
+            more = changed_files(current, settled)
+            current = settled
+            if not more:
+                break
+            changed |= more
+        self.files = current
+
+        affected = affected_scripts(self.find_scripts(), changed)
+        print(f"\nChanged: {', '.join(sorted(changed))}")
+        if affected:
+            self.rebuild(affected)
+        else:
+            print("  Nothing to rebuild")